@@ -4,21 +4,20 @@ Saves output data in a json file, and optionally saves a plot of the analyzed
 data.
 
 Usage:
-  analyze.py <filepath> [--plot]
+  analyze.py <filepath> [--plot] [--low-memory]
 
 Arguments:
   filepath  the path to an image file
 
 Options:
   --plot  shows the output plot
+  --low-memory  keep less data in memory and don't save the raw image
 """
 
 import json
 import os
 
 from docopt import docopt
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
 
 from quandry import JigsawPiece
 
@@ -28,8 +27,11 @@ if __name__ == '__main__':
   filepath = args['<filepath>']
   piece_data = {}
 
-  # Setup each axis.
+  # Setup each axis.  Plotting modules are slow to import, so they're only
+  # loaded when plotting.
   if args['--plot']:
+    import matplotlib.pyplot as plt
+    import matplotlib.gridspec as gridspec
     figure_grid = gridspec.GridSpec(1, 2)
     figure_grid.update(wspace=0.025, hspace=0.05)
     ax0 = plt.subplot(figure_grid[0, 0])
@@ -41,10 +43,11 @@ if __name__ == '__main__':
 
   # Start processing the image.
   print 'processing "%s"..' % filepath
-  piece = JigsawPiece(filepath)
+  piece = JigsawPiece(filepath, low_memory=args['--low-memory'])
   if args['--plot']:
     ax0.imshow(piece.raw_image, aspect='equal')
-  piece_data['raw_image'] = piece.raw_image.tolist()
+  if not args['--low-memory']:
+    piece_data['raw_image'] = piece.raw_image.tolist()
 
   # Get contours.
   try:
@@ -53,6 +56,8 @@ if __name__ == '__main__':
       ax0.plot(piece.outline[:, 0], -piece.outline[:, 1], color='green')
       ax1.plot(piece.outline[:, 0], piece.outline[:, 1], color='gray')
     piece_data['outline'] = piece.outline.tolist()
+    if args['--low-memory']:
+      piece.release_images()
   except:
     print 'could not find contours for "%s"' % filepath
 
@@ -88,6 +93,7 @@ if __name__ == '__main__':
       corner_ys = [c[1] for c in piece.corners]
       ax1.plot(corner_xs, corner_ys, 'og', markersize=8)
     piece_data['corners'] = [c.tolist() for c in piece.corners]
+    piece_data['corner_indices'] = [int(i) for i in piece.corner_indices]
   except:
     print 'could not find true corners for "%s"' % filepath
 
@@ -127,6 +133,13 @@ if __name__ == '__main__':
   except:
     print 'could not find side types for "%s"' % filepath
 
+  # Describe each side's shape for pre-filtering matches.
+  try:
+    piece.find_side_signatures()
+    piece_data['side_signatures'] = piece.side_signatures
+  except:
+    print 'could not find side signatures for "%s"' % filepath
+
   # Define the bounding box around each non-flat side.
   try:
     piece.find_bounding_boxes()
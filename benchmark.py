@@ -0,0 +1,83 @@
+"""Benchmarks for quandry.
+
+The startup benchmark measures how long it takes to import the quandry package
+and to start each script, by running them in fresh interpreters.  Scripts are
+run with --help so that only their imports and argument parsing are timed.
+
+The golden benchmark runs the pipeline over the sample pieces (or the given
+images) and compares the results against the recorded golden results, next
+to the time taken.  With --record, the golden results are recorded instead.
+
+Usage:
+  benchmark.py startup [--repeat=<n>]
+  benchmark.py golden [<filepath>...] [--record] [--no-fits]
+
+Options:
+  --repeat=<n>  how many times to run each command [default: 5]
+  --record  record new golden results rather than checking against them
+  --no-fits  skip fitting, and only check each piece's analysis
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from docopt import docopt
+
+
+STARTUP_COMMANDS = (
+  ('import quandry', ['-c', 'import quandry']),
+  ('enhance.py', ['enhance.py', '--help']),
+  ('outline.py', ['outline.py', '--help']),
+  ('analyze.py', ['analyze.py', '--help']),
+  ('crop.py', ['crop.py', '--help']),
+  ('fit.py', ['fit.py', '--help']),
+  ('sweep.py', ['sweep.py', '--help']),
+)
+
+
+def time_command(arguments, repeat):
+  """Run a python command in a fresh interpreter, returning each run's time."""
+  directory = os.path.dirname(os.path.abspath(__file__))
+  times = []
+  with open(os.devnull, 'w') as devnull:
+    for _ in range(repeat):
+      start = time.time()
+      subprocess.call([sys.executable] + arguments, cwd=directory,
+                      stdout=devnull, stderr=devnull)
+      times.append(time.time() - start)
+  return times
+
+
+if __name__ == '__main__':
+  args = docopt(__doc__)
+  repeat = int(args['--repeat'])
+  if args['startup']:
+    # Time a bare interpreter too, so the cost of our imports stands out.
+    baseline = min(time_command(['-c', 'pass'], repeat))
+    print '%20s  %8s  %8s' % ('command', 'best (s)', 'mean (s)')
+    print '%20s  %8.3f' % ('python', baseline)
+    for name, arguments in STARTUP_COMMANDS:
+      times = time_command(arguments, repeat)
+      print '%20s  %8.3f  %8.3f' % (name, min(times), sum(times) / len(times))
+  elif args['golden']:
+    from quandry import golden
+    filepaths = args['<filepath>'] or golden.sample_filepaths()
+    if args['--record']:
+      results = golden.record(filepaths=filepaths)
+      print 'recorded %s pieces to "%s"' % (
+        len(results['pieces']), golden.FIXTURE)
+      sys.exit()
+    expected = golden.load()
+    actual, timings = golden.run(filepaths, fits=not args['--no-fits'])
+    problems = golden.compare(expected, actual)
+    print '%20s  %8s  %10s' % ('stage', 'time (s)', 'golden (s)')
+    for stage in ('analysis', 'fitting'):
+      print '%20s  %8.3f  %10.3f' % (
+        stage, timings[stage], expected['timings'][stage])
+    for problem in problems:
+      print problem
+    print '%s pieces, %s differences from the golden results' % (
+      len(actual['pieces']), len(problems))
+    sys.exit(1 if problems else 0)
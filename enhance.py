@@ -1,32 +1,29 @@
 """Enhancing raw images.
 
+Many images can be enhanced at once, in parallel.
+
 Usage:
-  enhance.py <filepath> [--outdir=<outdir>]
+  enhance.py <filepath>... [options]
 
 Arguments:
   filepath  the path to an image file
 
 Options:
   --outdir=<outdir>  where to save enhanced images
+  --cutoff=<cutoff>  percent of darkest and lightest pixels to clip [default: 0]
+  --processes=<n>  how many processes to use (defaults to one per cpu)
 """
 
-import os
-
 from docopt import docopt
-from PIL import Image
-from PIL import ImageOps
+
+from quandry import pipeline
 
 
 if __name__ == '__main__':
   args = docopt(__doc__)
-  filepath = args['<filepath>']
-  image = Image.open(filepath)
-  enhanced = ImageOps.autocontrast(image)
-  extensionless_filename = filepath.split('.')[0]
-  outpath = '%s-enhanced.png' % extensionless_filename
-  if args['--outdir']:
-    outpath = os.path.join(args['--outdir'], outpath)
-    savedir = os.path.dirname(outpath)
-    if not os.path.exists(savedir):
-      os.makedirs(savedir)
-  enhanced.save(outpath)
+  outpaths = [
+    pipeline.output_path(filepath, '-enhanced.png', args['--outdir'])
+    for filepath in args['<filepath>']]
+  processes = int(args['--processes']) if args['--processes'] else None
+  pipeline.enhance_files(
+    args['<filepath>'], outpaths, float(args['--cutoff']), processes)
@@ -1,48 +1,53 @@
 """Fitting puzzle piece images together.
 
-Makes use of data generated by the 'analyze' script.
+Makes use of data generated by the 'analyze' script.  If a matcher file is
+given, the side index and scores are loaded from it and only pieces that have
+not been seen before are scored.  The updated state is then saved back.
+The saved matcher's settings can't be changed by --top, --chamfer or
+--signatures.
+
+Usage:
+  fit.py [<piece-data-filepath>] [--matcher=<matcher>] [--top=<k>] [--chamfer]
+         [--signatures=<threshold>]
+
+Arguments:
+  <piece-data-filepath>  path to the piece data json (piece-data.json if unset)
+
+Options:
+  --matcher=<matcher>  where to load and save the matcher state
+  --top=<k>  only keep the k best candidates for each side
+  --chamfer  score sides with distance transform lookups
+  --signatures=<threshold>  skip sides whose shape signatures differ by more
+                            than the threshold
 """
 
 import json
 
-from quandry import util
+from docopt import docopt
 
+from quandry import cli
+from quandry import pipeline
 
-# Load the data.
-with open('piece-data.json') as piece_data_file:
-  piece_data = json.loads(piece_data_file.read())
 
+if __name__ == '__main__':
+  args = docopt(__doc__)
+  piece_data_path = args['<piece-data-filepath>'] or 'piece-data.json'
 
-# Reorganize the data in terms of sides.  Each side is keyed by filepath and
-# the side index.
-sides = {}
-for filepath in piece_data:
-  for index, side in enumerate(piece_data[filepath]['sides']):
-    key = '%s+%s' % (filepath, index)
-    sides[key] = {
-      'name': key,
-      'type': piece_data[filepath]['side_types'][index],
-      'length': piece_data[filepath]['side_lengths'][index],
-      'outline': piece_data[filepath]['sides'][index],
-    }
-ins = [sides[k] for k in sides if sides[k]['type'] == 'in']
-outs = [sides[k] for k in sides if sides[k]['type'] == 'out']
+  # Load the data.
+  with open(piece_data_path) as piece_data_file:
+    piece_data = json.loads(piece_data_file.read())
 
-
-# Compare ins and outs.
-for in_side in ins:
-  print 'analyzing "%s"..' % in_side['name']
-  side_length_ratios = []
-  for out_side in outs:
-    if in_side['name'].split('+')[0] == out_side['name'].split('+')[0]:
-      continue
-    diff = util.percent_diff(in_side['length'], out_side['length'])
-    side_length_ratios.append((out_side['name'], diff))
-  hausdorff_scores = []
-  for name, ratio in sorted(side_length_ratios, key=lambda v: v[1]):
-    if ratio > 10:
+  # Restore the matcher, if we have one, and add any new pieces.
+  matcher_path = args['--matcher']
+  matcher = cli.load_matcher(args)
+  known_pieces = set(side.piece for side in matcher.sides.values())
+  for filepath in sorted(piece_data):
+    if filepath in known_pieces:
       continue
-    h_score = util.hausdorff(in_side['outline'], sides[name]['outline'])
-    hausdorff_scores.append((name, h_score))
-  for h in sorted(hausdorff_scores, key=lambda v: v[1]):
-    print '%10s -> %0.2f' % (h[0].split('/')[1], h[1])
+    print 'adding "%s"..' % filepath
+    matcher.add_piece(filepath, piece_data[filepath])
+  if matcher_path:
+    matcher.save(matcher_path)
+
+  # Show the ranked candidates for each in side.
+  pipeline.report_fits(matcher)
@@ -4,13 +4,14 @@ Saves output data in a json file, and optionally saves a plot of the analyzed
 data.  Low and high segmentation thresholds may also be set.
 
 Usage:
-  outline.py <filepath> [--low=<low>] [--high=<high>] [--plot]
+  outline.py <filepath> [--low=<low>] [--high=<high>] [--plot] [--low-memory]
 
 Arguments:
   filepath  the path to an image file
 
 Options:
   --plot  shows the output plot
+  --low-memory  keep less data in memory and don't save the raw image
   --low=<low>  the low segmentation threshold [default: 50]
   --high=<high>  the high segmentation threshold [default: 110]
 """
@@ -19,8 +20,6 @@ import json
 import os
 
 from docopt import docopt
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
 
 from quandry import JigsawPiece
 
@@ -32,8 +31,11 @@ if __name__ == '__main__':
   high_threshold = int(args['--high'])
   piece_data = {}
 
-  # Setup each axis.
+  # Setup each axis.  Plotting modules are slow to import, so they're only
+  # loaded when plotting.
   if args['--plot']:
+    import matplotlib.pyplot as plt
+    import matplotlib.gridspec as gridspec
     figure_grid = gridspec.GridSpec(1, 2)
     figure_grid.update(wspace=0.025, hspace=0.05)
     ax0 = plt.subplot(figure_grid[0, 0])
@@ -45,11 +47,12 @@ if __name__ == '__main__':
 
   # Start processing the image.
   print 'processing "%s"..' % filepath
-  piece = JigsawPiece(filepath)
+  piece = JigsawPiece(filepath, low_memory=args['--low-memory'])
   if args['--plot']:
     ax0.imshow(piece.raw_image, aspect='equal')
   piece_data[filepath] = {}
-  piece_data[filepath]['raw_image'] = piece.raw_image.tolist()
+  if not args['--low-memory']:
+    piece_data[filepath]['raw_image'] = piece.raw_image.tolist()
 
   # Get contours.
   try:
@@ -1,4 +1,5 @@
 """A quandry."""
 
 from piece import JigsawPiece
+from matcher import SideMatcher
 import compare
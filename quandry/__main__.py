@@ -0,0 +1,6 @@
+"""Lets the command line interface run with 'python -m quandry'."""
+
+from quandry import cli
+
+
+cli.main()
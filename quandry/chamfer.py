@@ -0,0 +1,82 @@
+"""Chamfer matching against distance transforms of reference sides."""
+
+import numpy as np
+
+from quandry import util
+
+
+class ChamferReference(object):
+  """A reference side rasterized into a distance transform image.
+
+  The side is aligned just as line a is in util.hausdorff, using its
+  canonical form from util.align_side: translated such that its first point
+  lies at the origin and rotated such that its endpoint lies on the x-axis.
+  Candidates then only need translating and flipping.  Each pixel of the
+  distance transform holds the distance to the nearest point on the side, so
+  scoring a candidate is one lookup per candidate point instead of a
+  nearest-neighbour search.  The image is built once and reused for every
+  candidate.
+
+  Note that the chamfer score averages over the candidate's points, whereas
+  util.hausdorff averages over the reference's points.
+  """
+
+  def __init__(self, side, resolution=1., margin=20):
+    """Rasterize the side.
+
+    Arguments:
+      side: a list of (x, y) points
+      resolution: the size of each distance transform pixel
+      margin: how far the image extends past the side's bounding box
+    """
+    # scipy is slow to import, so wait until it's needed.
+    from scipy import ndimage
+    self.resolution = resolution
+    self.line = util.align_side(side)[0]
+    # Densify the side so there are no gaps between rasterized points.
+    segment_lengths = np.sqrt(np.sum(np.diff(self.line, axis=0)**2, axis=1))
+    path_positions = np.concatenate(([0], np.cumsum(segment_lengths)))
+    samples = np.arange(0, path_positions[-1], resolution / 2.)
+    dense_line = np.column_stack((
+      np.interp(samples, path_positions, self.line[:, 0]),
+      np.interp(samples, path_positions, self.line[:, 1])))
+    dense_line = np.concatenate((dense_line, self.line[-1:]))
+    # Rasterize and compute the distance transform.
+    self.origin = self.line.min(axis=0) - margin
+    extent = self.line.max(axis=0) + margin - self.origin
+    self.shape = tuple(np.ceil(extent / resolution).astype(int) + 1)
+    mask = np.zeros(self.shape, dtype=bool)
+    pixels = np.round((dense_line - self.origin) / resolution).astype(int)
+    mask[pixels[:, 0], pixels[:, 1]] = True
+    self.distances = ndimage.distance_transform_edt(~mask) * resolution
+
+  def align(self, side):
+    """Align a candidate side, returning its translated form."""
+    return util.align_side(side)[1]
+
+  def mean_distance(self, points, flip=False):
+    """Mean distance from each point to the reference side.
+
+    If flip is set, the points are flipped over the x-axis first.  Points
+    beyond the image are looked up at the nearest pixel on the image's
+    border, plus the distance to that border.
+    """
+    pixels = (points - self.origin) / self.resolution
+    if flip:
+      pixels[:, 1] = (-points[:, 1] - self.origin[1]) / self.resolution
+    indices = np.round(pixels).astype(int)
+    clipped = np.clip(indices, 0, np.array(self.shape) - 1)
+    overshoot = np.sqrt(np.sum((pixels - clipped)**2, axis=1))
+    distances = self.distances[clipped[:, 0], clipped[:, 1]]
+    distances = distances + np.where(
+      (indices == clipped).all(axis=1), 0, overshoot * self.resolution)
+    return np.mean(distances)
+
+  def score(self, side):
+    """Score a candidate side, taking the better of its two alignments."""
+    return self.score_aligned(self.align(side))
+
+  def score_aligned(self, translated):
+    """Score a candidate side from its translated form, as from align."""
+    return min(self.mean_distance(translated, flip=True),
+               self.mean_distance(translated))
@@ -0,0 +1,203 @@
+"""Command line interface for quandry.
+
+Each command can be given many images.  The 'run' command chains every stage
+in one process -- images are decoded once and intermediate results stay in
+memory, so only the requested outputs are written.  The 'serve' command
+accepts images over HTTP and analyzes them on a pool of processes.
+
+Usage:
+  quandry enhance <filepath>... [options]
+  quandry outline <filepath>... [options]
+  quandry analyze <filepath>... [options]
+  quandry crop <image-filepath> <piece-data-filepath> [options]
+  quandry fit <piece-data-filepath> [options]
+  quandry run <filepath>... [options]
+  quandry serve [options]
+
+Arguments:
+  <filepath>  path to an image file
+  <image-filepath>  path to the piece image
+  <piece-data-filepath>  path to a piece data json file
+
+Options:
+  --outdir=<outdir>  where to save output files (defaults to beside the input)
+  --low=<low>  the low segmentation threshold [default: 50]
+  --high=<high>  the high segmentation threshold [default: 110]
+  --low-memory  keep less data in memory and don't save the raw image
+  --matcher=<matcher>  where to load and save the matcher state
+  --top=<k>  only keep the k best candidates for each side
+  --chamfer  score sides with distance transform lookups
+  --signatures=<threshold>  skip sides whose shape signatures differ by more
+                            than the threshold
+  --cutoff=<cutoff>  percent of darkest and lightest pixels to clip when
+                     enhancing [default: 0]
+  --clahe  also apply adaptive histogram equalization in the 'run' command
+  --no-enhance  skip enhancement in the 'run' command
+  --save-enhanced  save each enhanced image in the 'run' command
+  --save-cropped  save each cropped image in the 'run' command
+  --piece-data=<path>  save all piece data to one json file in 'run'
+  --host=<host>  the address to serve on [default: 127.0.0.1]
+  --port=<port>  the port to serve on [default: 8000]
+  --processes=<n>  how many processes to enhance images with in 'enhance', or
+                   to analyze them with in 'serve' (defaults to one per cpu)
+  --max-pending=<n>  how many images may wait or run before new ones are
+                     turned away (defaults to twice the processes)
+  --timeout=<seconds>  how long an image may take to analyze before it counts
+                       as failed [default: 300]
+"""
+
+import json
+import os
+import sys
+
+from docopt import docopt
+
+from quandry import pipeline
+from quandry.matcher import SideMatcher
+from quandry.piece import JigsawPiece
+
+
+def load_matcher(args):
+  """Build a side matcher from the command line options.
+
+  If the matcher file exists, the matcher is restored from it.  Its saved
+  settings can't be changed, so exits with an error if --top, --chamfer or
+  --signatures ask for different ones.
+  """
+  matcher_path = args['--matcher']
+  top_k = int(args['--top']) if args['--top'] else None
+  mode = 'chamfer' if args['--chamfer'] else 'hausdorff'
+  signature_threshold = None
+  if args['--signatures']:
+    signature_threshold = float(args['--signatures'])
+  if not (matcher_path and os.path.exists(matcher_path)):
+    return SideMatcher(
+      top_k=top_k, mode=mode, signature_threshold=signature_threshold)
+  matcher = SideMatcher.load(matcher_path)
+  conflicts = []
+  if args['--top'] and top_k != matcher.top_k:
+    conflicts.append('--top=%s (saved with %s)' % (top_k, matcher.top_k))
+  if args['--chamfer'] and matcher.mode != 'chamfer':
+    conflicts.append('--chamfer (saved in %s mode)' % matcher.mode)
+  if (args['--signatures'] and
+      signature_threshold != matcher.signature_threshold):
+    conflicts.append('--signatures=%s (saved with %s)' % (
+      signature_threshold, matcher.signature_threshold))
+  if conflicts:
+    sys.exit('can\'t change the settings of "%s": %s' % (
+      matcher_path, ', '.join(conflicts)))
+  return matcher
+
+
+def enhance(args):
+  """Save an enhanced copy of each image."""
+  filepaths = args['<filepath>']
+  outpaths = [
+    pipeline.output_path(filepath, '-enhanced.png', args['--outdir'])
+    for filepath in filepaths]
+  processes = int(args['--processes']) if args['--processes'] else None
+  pipeline.enhance_files(
+    filepaths, outpaths, float(args['--cutoff']), processes)
+
+
+def outline(args):
+  """Find and save the outline of each piece."""
+  for filepath in args['<filepath>']:
+    print 'processing "%s"..' % filepath
+    piece = JigsawPiece(filepath, low_memory=args['--low-memory'])
+    try:
+      piece_data = pipeline.outline_piece(
+        piece, int(args['--low']), int(args['--high']))
+    except Exception:
+      print 'could not find contours for "%s"' % filepath
+      continue
+    if not args['--low-memory']:
+      piece_data['raw_image'] = piece.raw_image.tolist()
+    pipeline.save_piece_data({filepath: piece_data}, pipeline.output_path(
+      filepath, '-outline.json', args['--outdir']))
+
+
+def analyze(args):
+  """Analyze each piece and save its piece data."""
+  for filepath in args['<filepath>']:
+    print 'processing "%s"..' % filepath
+    piece = JigsawPiece(filepath, low_memory=args['--low-memory'])
+    try:
+      piece_data = pipeline.analyze_piece(
+        piece, int(args['--low']), int(args['--high']))
+    except Exception as error:
+      print 'could not analyze "%s": %s' % (filepath, error)
+      continue
+    if not args['--low-memory']:
+      piece_data['raw_image'] = piece.raw_image.tolist()
+    pipeline.save_piece_data(piece_data, pipeline.output_path(
+      filepath, '.json', args['--outdir']))
+
+
+def crop(args):
+  """Crop a piece image to its outline."""
+  filepath = args['<image-filepath>']
+  with open(args['<piece-data-filepath>']) as piece_data_file:
+    piece_data = json.loads(piece_data_file.read())
+  image = pipeline.crop_image(
+    pipeline.load_image(filepath), piece_data['outline'])
+  pipeline.save_image(image, pipeline.output_path(
+    filepath, '-cropped.png', args['--outdir']))
+
+
+def fit(args):
+  """Fit pieces together using saved piece data."""
+  with open(args['<piece-data-filepath>']) as piece_data_file:
+    piece_data = json.loads(piece_data_file.read())
+  matcher = load_matcher(args)
+  known_pieces = set(side.piece for side in matcher.sides.values())
+  for filepath in sorted(piece_data):
+    if filepath not in known_pieces:
+      matcher.add_piece(filepath, piece_data[filepath])
+  if args['--matcher']:
+    matcher.save(args['--matcher'])
+  pipeline.report_fits(matcher)
+
+
+def run(args):
+  """Enhance, analyze, crop and fit images in one process."""
+  matcher = load_matcher(args)
+  piece_data = pipeline.run(
+    args['<filepath>'], matcher, enhance=not args['--no-enhance'],
+    low_threshold=int(args['--low']), high_threshold=int(args['--high']),
+    outdir=args['--outdir'], save_enhanced=args['--save-enhanced'],
+    save_cropped=args['--save-cropped'], cutoff=float(args['--cutoff']),
+    clahe=args['--clahe'], low_memory=args['--low-memory'])
+  if args['--piece-data']:
+    pipeline.save_piece_data(piece_data, args['--piece-data'])
+  if args['--matcher']:
+    matcher.save(args['--matcher'])
+  pipeline.report_fits(matcher)
+
+
+def serve(args):
+  """Analyze images sent over HTTP."""
+  from quandry import server
+  processes = int(args['--processes']) if args['--processes'] else None
+  max_pending = int(args['--max-pending']) if args['--max-pending'] else None
+  server.serve(args['--host'], int(args['--port']), processes, max_pending,
+               float(args['--timeout']))
+
+
+COMMANDS = (
+  ('enhance', enhance),
+  ('outline', outline),
+  ('analyze', analyze),
+  ('crop', crop),
+  ('fit', fit),
+  ('run', run),
+  ('serve', serve),
+)
+
+
+def main(argv=None):
+  """Parse the command line and run the chosen command."""
+  args = docopt(__doc__, argv=argv)
+  for name, command in COMMANDS:
+    if args[name]:
+      return command(args)
@@ -0,0 +1,190 @@
+"""Golden outputs for checking changes to the pipeline.
+
+The pipeline is run over the sample pieces and a compact summary of what it
+found -- each outline's size and shape, the corners, side types and lengths,
+and the best fits for each in side -- is recorded to a fixture.  Later runs are
+compared against the fixture within numeric tolerances, and timed, so that a
+faster implementation can be checked to still give the same results.
+"""
+
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from quandry import pipeline
+from quandry import records
+from quandry import util
+from quandry.matcher import SideMatcher
+from quandry.piece import JigsawPiece
+
+
+SAMPLE_PIECES = os.path.join(
+  os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+  'sample-pieces')
+FIXTURE = os.path.join(
+  os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures',
+  'golden.json')
+
+# Absolute tolerances are in pixels, relative ones are fractions.
+TOLERANCES = {
+  'outline_points': 0.02,
+  'outline_area': 0.02,
+  'outline_center': 2.,
+  'corners': 3.,
+  'side_lengths': 0.03,
+  'fit_scores': 0.1,
+}
+
+
+def sample_filepaths():
+  """List the sample piece images, in a stable order."""
+  return sorted(glob.glob(os.path.join(SAMPLE_PIECES, '*.jpg')))
+
+
+def summarize_piece(piece):
+  """Summarize an analyzed piece's results."""
+  outline = piece.outline
+  return {
+    'outline': {
+      'points': len(outline),
+      'area': abs(util.signed_area(outline)),
+      'center': [float(np.mean(outline[:, 0])),
+                 float(np.mean(outline[:, 1]))],
+    },
+    'corners': [[float(c[0]), float(c[1])] for c in piece.corners],
+    'side_types': list(piece.side_types),
+    'side_lengths': [float(length) for length in piece.side_lengths],
+  }
+
+
+def summarize_fits(matcher, limit=3):
+  """Get the best few candidates and their scores for each in side."""
+  fits = {}
+  for name in sorted(matcher.sides):
+    if matcher.sides[name].type == 'in':
+      fits[name] = [[candidate, float(score)] for candidate, score
+                    in matcher.ranked_candidates(name, limit)]
+  return fits
+
+
+def run(filepaths, fits=True, low_threshold=50, high_threshold=110):
+  """Run the pipeline over the pieces, summarizing and timing each stage.
+
+  Pieces are named by their image's filename.  Returns the results and the
+  seconds spent on analysis and on fitting.
+  """
+  results = {'pieces': {}, 'fits': {}}
+  timings = {'analysis': 0., 'fitting': 0.}
+  matcher = SideMatcher(top_k=3)
+  for filepath in filepaths:
+    name = os.path.basename(filepath)
+    piece = JigsawPiece(filepath)
+    start = time.time()
+    pipeline.analyze_piece(piece, low_threshold, high_threshold)
+    timings['analysis'] += time.time() - start
+    results['pieces'][name] = summarize_piece(piece)
+    if fits:
+      start = time.time()
+      matcher.add_summary(records.PieceSummary.from_piece(name, piece))
+      timings['fitting'] += time.time() - start
+  if fits:
+    results['fits'] = summarize_fits(matcher)
+  return results, timings
+
+
+def record(filepath=FIXTURE, filepaths=None):
+  """Run the pipeline over the sample pieces and save its results."""
+  results, timings = run(filepaths or sample_filepaths())
+  results['timings'] = timings
+  directory = os.path.dirname(filepath)
+  if directory and not os.path.exists(directory):
+    os.makedirs(directory)
+  with open(filepath, 'w') as fixture_file:
+    fixture_file.write(json.dumps(results, indent=1, sort_keys=True))
+  return results
+
+
+def load(filepath=FIXTURE):
+  """Load recorded golden results."""
+  with open(filepath) as fixture_file:
+    return json.loads(fixture_file.read())
+
+
+def within(expected, actual, tolerance, relative=False):
+  """Check that two numbers, or arrays of them, are close enough."""
+  expected = np.asarray(expected, dtype=float)
+  actual = np.asarray(actual, dtype=float)
+  if expected.shape != actual.shape:
+    return False
+  if relative:
+    tolerance = tolerance * np.abs(expected)
+  return bool(np.all(np.abs(expected - actual) <= tolerance))
+
+
+def compare_piece(expected, actual, tolerances=TOLERANCES):
+  """List the ways a piece's results differ from the golden ones."""
+  problems = []
+  checks = (
+    ('outline points', expected['outline']['points'],
+     actual['outline']['points'], tolerances['outline_points'], True),
+    ('outline area', expected['outline']['area'], actual['outline']['area'],
+     tolerances['outline_area'], True),
+    ('outline center', expected['outline']['center'],
+     actual['outline']['center'], tolerances['outline_center'], False),
+    ('corners', expected['corners'], actual['corners'],
+     tolerances['corners'], False),
+    ('side lengths', expected['side_lengths'], actual['side_lengths'],
+     tolerances['side_lengths'], True),
+  )
+  for label, expected_value, actual_value, tolerance, relative in checks:
+    if not within(expected_value, actual_value, tolerance, relative):
+      problems.append('%s: expected %s, got %s' % (
+        label, expected_value, actual_value))
+  if expected['side_types'] != actual['side_types']:
+    problems.append('side types: expected %s, got %s' % (
+      expected['side_types'], actual['side_types']))
+  return problems
+
+
+def compare_fits(expected, actual, tolerances=TOLERANCES):
+  """List the ways the fits differ from the golden ones.
+
+  The best candidate for each side must be the same.  Scores are compared
+  for every candidate that's in both rankings.
+  """
+  problems = []
+  for name in sorted(set(expected) | set(actual)):
+    expected_fits = dict(expected.get(name, []))
+    actual_fits = dict(actual.get(name, []))
+    expected_best = expected[name][0][0] if expected.get(name) else None
+    actual_best = actual[name][0][0] if actual.get(name) else None
+    if expected_best != actual_best:
+      problems.append('%s: expected best fit %s, got %s' % (
+        name, expected_best, actual_best))
+    for candidate in set(expected_fits) & set(actual_fits):
+      if not within(expected_fits[candidate], actual_fits[candidate],
+                    tolerances['fit_scores'], relative=True):
+        problems.append('%s: expected %s to score %0.2f, got %0.2f' % (
+          name, candidate, expected_fits[candidate], actual_fits[candidate]))
+  return problems
+
+
+def compare(expected, actual, tolerances=TOLERANCES):
+  """List the ways results differ from the golden ones.
+
+  Only pieces in the actual results are compared, and fits are only compared
+  when the actual results have some.
+  """
+  problems = []
+  for name in sorted(actual['pieces']):
+    if name not in expected['pieces']:
+      problems.append('%s: no golden results' % name)
+      continue
+    problems.extend('%s: %s' % (name, problem) for problem in compare_piece(
+      expected['pieces'][name], actual['pieces'][name], tolerances))
+  if actual['fits']:
+    problems.extend(compare_fits(expected['fits'], actual['fits'], tolerances))
+  return problems
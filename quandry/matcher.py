@@ -0,0 +1,264 @@
+"""Incrementally matching sides as pieces arrive."""
+
+import bisect
+import json
+
+import numpy as np
+
+from quandry import chamfer
+from quandry import records
+from quandry import util
+
+
+# Sides of one type can only fit sides of the complementary type.
+COMPLEMENTS = {
+  'in': 'out',
+  'out': 'in',
+}
+
+
+class SideMatcher(object):
+  """Keeps a side index and score table that grow one piece at a time.
+
+  Sides are indexed by type and sorted by length, so adding a piece only
+  scores its sides against the complementary sides of similar length -- the
+  same pairs that the batch fitting script would score.  Ranked candidate
+  lists are updated in place.
+
+  Scores are always computed as hausdorff(in_outline, out_outline), matching
+  the direction used by the original fitting script.
+
+  If top_k is set, each side only keeps its k best candidates and scoring
+  uses util.bounded_hausdorff: a pair is abandoned as soon as it provably
+  can't make the top k for either of its sides.
+
+  With the 'chamfer' mode, each in side is rasterized once into a distance
+  transform and out sides are scored by lookups into it.
+
+  If signature_threshold is set, sides whose signatures (see
+  util.side_signature) are further apart than the threshold are never scored.
+  """
+
+  def __init__(self, length_threshold=10, top_k=None, mode='hausdorff',
+               signature_threshold=None):
+    if mode not in ('hausdorff', 'chamfer'):
+      raise ValueError('unknown matching mode "%s"' % mode)
+    self.length_threshold = length_threshold
+    self.top_k = top_k
+    self.mode = mode
+    self.signature_threshold = signature_threshold
+    # Side records keyed by name ('<piece name>+<side index>').
+    self.sides = {}
+    # Side names for each piece name.
+    self.pieces = {}
+    # Sorted (length, name) pairs for each side type.
+    self.lengths = {
+      'in': [],
+      'out': [],
+    }
+    # Scores keyed by (in name, out name).
+    self.scores = {}
+    # Ranked (score, name) candidates for each in and out side.
+    self.candidates = {}
+    # Distance transforms of in sides, built on demand in 'chamfer' mode.
+    self.chamfer_references = {}
+
+  def add_piece(self, piece_name, piece_data):
+    """Add a piece's sides to the index and score them against existing sides.
+
+    If a piece with the same name was already added, it's replaced.
+
+    Arguments:
+      piece_name: a unique name for the piece, typically its filepath
+      piece_data: a dict with 'sides', 'side_types' and 'side_lengths', as
+        generated by the 'analyze' script
+
+    Returns a list of the (in name, out name) pairs that were scored.
+    """
+    return self.add_summary(
+      records.PieceSummary.from_data(piece_name, piece_data))
+
+  def add_summary(self, summary):
+    """Add the sides of a records.PieceSummary, scoring them as they go in.
+
+    If a piece with the same name was already added, it's replaced -- see
+    remove_piece.
+
+    Returns a list of the (in name, out name) pairs that were scored.
+    """
+    self.remove_piece(summary.name)
+    scored = []
+    for side in summary.sides:
+      if side.type not in COMPLEMENTS:
+        continue
+      others = self.similar_sides(side)
+      if self.signature_threshold is not None:
+        others = self.similar_signatures(side, others)
+      for other in others:
+        if side.type == 'in':
+          in_side, out_side = side, other
+        else:
+          in_side, out_side = other, side
+        score = self.score(in_side, out_side)
+        if score is None:
+          continue
+        self.add_score(in_side, out_side, score)
+        scored.append((in_side.name, out_side.name))
+    # Index the new sides after scoring so a piece is never compared with
+    # itself.
+    for side in summary.sides:
+      self.index_side(side)
+    return scored
+
+  def remove_piece(self, piece_name):
+    """Remove a piece's sides, scores and candidate entries.
+
+    Returns True if the piece was known.  Note that when top_k is set, other
+    sides' rankings may then hold fewer than k candidates, since candidates
+    that the removed piece pushed out were never kept.
+    """
+    names = self.pieces.pop(piece_name, None)
+    if not names:
+      return False
+    for name in names:
+      side = self.sides.pop(name)
+      if side.type in COMPLEMENTS:
+        self.lengths[side.type].remove((side.length, name))
+      self.candidates.pop(name, None)
+      self.chamfer_references.pop(name, None)
+    for in_name, out_name in self.scores.keys():
+      if in_name in names or out_name in names:
+        del self.scores[(in_name, out_name)]
+    for ranked in self.candidates.values():
+      ranked[:] = [(score, name) for score, name in ranked
+                   if name not in names]
+    return True
+
+  def index_side(self, side):
+    """Add a side to the length index."""
+    self.sides[side.name] = side
+    self.pieces.setdefault(side.piece, set()).add(side.name)
+    if side.type in COMPLEMENTS:
+      bisect.insort(self.lengths[side.type], (side.length, side.name))
+      self.candidates.setdefault(side.name, [])
+
+  def similar_sides(self, side):
+    """Find complementary sides whose lengths are close to the given side's.
+
+    Lengths are compared with util.percent_diff relative to the in side, and
+    candidates are returned in order of increasing length difference.
+    """
+    complement = COMPLEMENTS[side.type]
+    length = side.length
+    ratio = self.length_threshold / 100.
+    # Bracket the range with a little slack, then apply the exact test.
+    if side.type == 'in':
+      low, high = length * (1 - ratio), length * (1 + ratio)
+    else:
+      low, high = length / (1 + ratio), length / max(1 - ratio, 1e-9)
+    index = self.lengths[complement]
+    start = bisect.bisect_left(index, (low * 0.999,))
+    stop = bisect.bisect_left(index, (high * 1.001,))
+    similar = []
+    for other_length, name in index[start:stop]:
+      other = self.sides[name]
+      if other.piece == side.piece:
+        continue
+      if side.type == 'in':
+        diff = util.percent_diff(length, other_length)
+      else:
+        diff = util.percent_diff(other_length, length)
+      if diff > self.length_threshold:
+        continue
+      similar.append((diff, other))
+    return [other for _, other in sorted(similar, key=lambda s: s[0])]
+
+  def similar_signatures(self, side, others):
+    """Filter sides down to those with signatures close to the given side's.
+
+    All of the signature distances are computed at once, and the order of the
+    other sides is kept.
+    """
+    if not others:
+      return others
+    signatures = np.array([other.signature for other in others])
+    distances = np.sqrt(np.sum((signatures - side.signature)**2, axis=1))
+    return [other for other, distance in zip(others, distances)
+            if distance <= self.signature_threshold]
+
+  def score(self, in_side, out_side):
+    """Score a pair of sides.
+
+    Returns None if top_k is set and the pair can't make the top k for either
+    side.
+    """
+    threshold = max(self.worst_candidate_score(in_side.name),
+                    self.worst_candidate_score(out_side.name))
+    if self.mode == 'chamfer':
+      if in_side.name not in self.chamfer_references:
+        self.chamfer_references[in_side.name] = chamfer.ChamferReference(
+          in_side.outline)
+      score = self.chamfer_references[in_side.name].score_aligned(
+        out_side.translated)
+      if score > threshold:
+        return None
+      return score
+    # Both sides' canonical forms are cached, so pairs aren't transformed.
+    if self.top_k is None:
+      return util.aligned_hausdorff(in_side.aligned, out_side.translated)
+    return util.bounded_aligned_hausdorff(
+      in_side.aligned, out_side.translated, threshold)
+
+  def worst_candidate_score(self, side_name):
+    """Get the score a new candidate must beat to make a side's top k."""
+    ranked = self.candidates.get(side_name, [])
+    if self.top_k is None or len(ranked) < self.top_k:
+      return float('inf')
+    return ranked[self.top_k - 1][0]
+
+  def add_score(self, in_side, out_side, score):
+    """Record a score and insert it into both sides' ranked candidates."""
+    # Sides are float32, so keep scores as plain floats for json.
+    score = float(score)
+    self.scores[(in_side.name, out_side.name)] = score
+    for name, other_name in ((in_side.name, out_side.name),
+                             (out_side.name, in_side.name)):
+      ranked = self.candidates.setdefault(name, [])
+      bisect.insort(ranked, (score, other_name))
+      if self.top_k is not None:
+        del ranked[self.top_k:]
+
+  def ranked_candidates(self, side_name, limit=None):
+    """Get the best-fitting complementary sides as (name, score) pairs."""
+    ranked = self.candidates.get(side_name, [])
+    if limit is not None:
+      ranked = ranked[0:limit]
+    return [(name, score) for score, name in ranked]
+
+  def save(self, filepath):
+    """Persist the side index and score table as json."""
+    data = {
+      'length_threshold': self.length_threshold,
+      'top_k': self.top_k,
+      'mode': self.mode,
+      'signature_threshold': self.signature_threshold,
+      'sides': [side.to_dict() for side in self.sides.values()],
+      'scores': [[a, b, s] for (a, b), s in self.scores.items()],
+    }
+    with open(filepath, 'w') as matcher_file:
+      matcher_file.write(json.dumps(data))
+
+  @classmethod
+  def load(cls, filepath):
+    """Restore a matcher saved with SideMatcher.save."""
+    with open(filepath) as matcher_file:
+      data = json.loads(matcher_file.read())
+    matcher = cls(
+      length_threshold=data['length_threshold'], top_k=data.get('top_k'),
+      mode=data.get('mode', 'hausdorff'),
+      signature_threshold=data.get('signature_threshold'))
+    for side_data in data['sides']:
+      matcher.index_side(records.Side.from_dict(side_data))
+    for in_name, out_name, score in data['scores']:
+      matcher.add_score(matcher.sides[in_name], matcher.sides[out_name], score)
+    return matcher
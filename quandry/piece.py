@@ -4,49 +4,137 @@ import itertools
 import math
 
 import numpy as np
-from scipy import ndimage
-from skimage import filters
-from skimage import io
-from skimage import measure
-from skimage import morphology
 
+from quandry import records
 from quandry import util
 
 
 class JigsawPiece(object):
-  """Representation of a puzzle piece."""
+  """Representation of a puzzle piece.
 
-  def __init__(self, filepath):
+  In low memory mode, the grey image is kept as uint8 rather than float64, the
+  raw image is not kept but reopened from disk whenever it's accessed, and
+  large intermediates are dropped or packed into compact arrays as soon as the
+  next stage no longer needs them.
+
+  scipy and skimage are slow to import, so they're imported by the methods
+  that use them rather than when this module is loaded.
+
+  An already-decoded RGB image may be passed in, in which case the file is
+  not read.  That image is always kept, since it can't be reopened.
+  """
+
+  def __init__(self, filepath, low_memory=False, image=None):
+    self.filepath = filepath
+    self.low_memory = low_memory
+    from skimage import color
+    from skimage import img_as_ubyte
+    from skimage import io
     # Load the image and denoise.
-    self.raw_image = io.imread(filepath)
-    self.grey_image = io.imread(filepath, as_grey=True)
+    if image is not None:
+      self._raw_image = image
+      self.grey_image = color.rgb2gray(image)
+      if low_memory:
+        self.grey_image = img_as_ubyte(self.grey_image)
+    elif low_memory:
+      self._raw_image = None
+      self.grey_image = img_as_ubyte(io.imread(filepath, as_grey=True))
+    else:
+      self._raw_image = io.imread(filepath)
+      self.grey_image = io.imread(filepath, as_grey=True)
     # Setup other to-be-determined attributes.
+    self.enhancement = {}
     self.segmentation = []
     self.outline = np.array([])
     self.hausdorff_scores = []
     self.candidate_corners = []
+    self.candidate_corner_indices = []
     self.center = []
     self.angles = []
     self.corner_sets = []
     self.areas = []
     self.corners = []
+    self.corner_indices = []
     self.sides = []
     self.side_lengths = []
     self.mean_side_points = []
     self.side_types = []
+    self.side_signatures = []
     self.bounding_boxes = []
     self.aspect_ratios = []
 
-  def segment(self, low_threshold=50, high_threshold=110, contour_level=0.5):
+  @property
+  def raw_image(self):
+    """The raw image, which is reopened if it hasn't been kept in memory."""
+    if self._raw_image is None:
+      from skimage import io
+      return io.imread(self.filepath)
+    return self._raw_image
+
+  @raw_image.setter
+  def raw_image(self, image):
+    self._raw_image = image
+
+  def release_images(self):
+    """Drop the images and segmentation once the outline has been found.
+
+    The raw image can still be accessed afterwards, it'll just be reopened.
+    """
+    self._raw_image = None
+    self.grey_image = None
+    self.segmentation = []
+
+  def enhance(self, cutoff=0, clahe=False, clip_limit=0.01):
+    """Boost the contrast of the piece's images before segmentation.
+
+    Each channel of the raw image is stretched to fill the whole range,
+    clipping the darkest and lightest cutoff percent of pixels, and the grey
+    image is derived from the result.  This gives the same grey image as
+    enhancing the file and then analyzing that.  Contrast limited adaptive
+    histogram equalization (CLAHE) can then be applied to the grey image.  In
+    low memory mode the raw image is reopened to be enhanced, but the result
+    isn't kept.  The settings are saved so they can be recorded with the rest
+    of the piece data.
+    """
+    from skimage import color
+    from skimage import img_as_ubyte
+    raw_image = util.autocontrast(self.raw_image, cutoff)
+    self.grey_image = color.rgb2gray(raw_image)
+    if self.low_memory:
+      self.grey_image = img_as_ubyte(self.grey_image)
+    if clahe:
+      from skimage import exposure
+      equalized = exposure.equalize_adapthist(
+        self.grey_image, clip_limit=clip_limit)
+      if self.grey_image.dtype == np.uint8:
+        equalized = img_as_ubyte(equalized)
+      self.grey_image = equalized
+    if self._raw_image is not None:
+      self._raw_image = raw_image
+    self.enhancement = {
+      'cutoff': cutoff,
+      'clahe': clahe,
+      'clip_limit': clip_limit,
+    }
+
+  def segment(self, low_threshold=50, high_threshold=110, contour_level=0.5,
+              smoothing=0):
     """Finds the piece's outline via region-based segmentation.
 
+    The outline is then normalized -- see normalize_outline.
+
     http://scikit-image.org/docs/dev/user_guide/tutorial_segmentation.html
     http://scikit-image.org/docs/dev/auto_examples/plot_contours.html
     """
+    from scipy import ndimage
+    from skimage import filters
+    from skimage import measure
+    from skimage import morphology
     elevation_map = filters.sobel(self.grey_image)
     markers = np.zeros_like(self.grey_image)
-    low_threshold = low_threshold / 255.
-    high_threshold = high_threshold / 255.
+    if self.grey_image.dtype != np.uint8:
+      low_threshold = low_threshold / 255.
+      high_threshold = high_threshold / 255.
     markers[self.grey_image < low_threshold] = 2
     markers[self.grey_image > high_threshold] = 1
     self.segmentation = morphology.watershed(elevation_map, markers)
@@ -55,7 +143,31 @@ class JigsawPiece(object):
     largest_contour = sorted(contours, key=lambda c: len(c))[-1]
     # We have to flip these coordinates over y=-x to fix some issues with the
     # plots.
-    self.outline = np.array([[p[1], -p[0]] for p in largest_contour])
+    self.outline = np.column_stack((largest_contour[:, 1],
+                                    -largest_contour[:, 0]))
+    self.normalize_outline(smoothing)
+    if self.low_memory:
+      self.segmentation = []
+
+  def normalize_outline(self, smoothing=0):
+    """Give the outline a deterministic orientation and start point.
+
+    The point repeated to close the contour is dropped, the outline is made to
+    run clockwise and it's rolled to start at its topmost point (the leftmost
+    one, if there's a tie).  The outline can also be smoothed with a Gaussian
+    filter along its length, where smoothing is the filter's sigma in points.
+    """
+    outline = self.outline
+    if len(outline) > 1 and np.array_equal(outline[0], outline[-1]):
+      outline = outline[:-1]
+    if smoothing:
+      from scipy import ndimage
+      outline = ndimage.gaussian_filter1d(
+        outline, smoothing, axis=0, mode='wrap')
+    if util.signed_area(outline) > 0:
+      outline = outline[::-1]
+    start = np.lexsort((outline[:, 0], -outline[:, 1]))[0]
+    self.outline = np.roll(outline, -start, axis=0)
 
   def find_center(self):
     """Find approximate center."""
@@ -130,44 +242,51 @@ class JigsawPiece(object):
         area = 0
       self.areas.append([rect, area])
 
-  def find_true_corners(self):
-    """Take a guess at the true corners."""
+  def find_true_corners(self, center_dist_threshold=0.3, angle_threshold=0.4):
+    """Take a guess at the true corners.
+
+    Along with each corner, the index of the outline point it lies on is kept
+    in corner_indices.
+    """
     self.find_angles()
-    self.find_corner_sets()
+    self.find_corner_sets(center_dist_threshold, angle_threshold)
     self.find_rect_candidates()
     sorted_areas = sorted(self.areas, key=lambda a: a[1], reverse=True)
-    corners = []
-    for index in sorted_areas[0][0]:
-      corners.append(self.candidate_corners[index])
     # Sort them such that the top left corner is first and then they proceed in
     # clockwise order.
-    angles = [(c, util.angle(c, self.center)) for c in corners]
-    corners = [c[0] for c in sorted(angles, key=lambda a: a[1])]
-    self.corners = [corners[1], corners[0], corners[3], corners[2]]
+    angles = [(index, util.angle(self.candidate_corners[index], self.center))
+              for index in sorted_areas[0][0]]
+    indices = [a[0] for a in sorted(angles, key=lambda a: a[1])]
+    indices = [indices[1], indices[0], indices[3], indices[2]]
+    self.corners = [self.candidate_corners[index] for index in indices]
+    self.corner_indices = [
+      self.candidate_corner_indices[index] for index in indices]
+    if self.low_memory:
+      self.areas = records.rect_candidate_array(self.areas)
 
   def find_sides(self):
-    """Find the piece's four sides."""
-    for corner_index, corner_one in enumerate(self.corners):
-      # The corners may not lie directly on the piece's outline.  So we find the
-      # points closest to the corners that do lie on the outline.
-      corner_one_distances = [
-        util.distance(corner_one, p) for p in self.outline]
-      index_one = corner_one_distances.index(min(corner_one_distances))
-      corner_two = self.corners[(corner_index + 1) % 4]
-      corner_two_distances = [
-        util.distance(corner_two, p) for p in self.outline]
-      index_two = corner_two_distances.index(min(corner_two_distances))
-      # The array of coordinates defining the outline may wrap around as we
-      # trace a specific side..
-      larger_index = max((index_one, index_two))
-      smaller_index = min((index_one, index_two))
-      if float(larger_index - smaller_index) / len(self.outline) > 0.4:
-        side = np.concatenate(
-          (self.outline[larger_index:-1], self.outline[0:smaller_index]),
-          axis=0)
-      else:
-        side = self.outline[smaller_index:larger_index]
-      self.sides.append(side)
+    """Find the piece's four sides.
+
+    Each side runs from one corner to the next, including both corners.  The
+    outline is copied once into a ring that starts and ends at the first
+    corner, so that every side is a view into it, even one that wraps around
+    the end of the outline.
+
+    Raises ValueError unless the corners are in clockwise order along the
+    outline, starting from any of them.
+    """
+    first = self.corner_indices[0]
+    ring = np.concatenate(
+      (self.outline[first:], self.outline[:first + 1]), axis=0)
+    # The corners and the normalized outline both run clockwise, so the
+    # corners' offsets along the ring should increase.
+    offsets = [(index - first) % len(self.outline)
+               for index in self.corner_indices]
+    offsets.append(len(self.outline))
+    if any(a >= b for a, b in zip(offsets, offsets[1:])):
+      raise ValueError('corners %s are not in order along the outline' % (
+        list(self.corner_indices)))
+    self.sides = [ring[offsets[i]:offsets[i + 1] + 1] for i in range(4)]
 
   def find_side_lengths(self):
     """Find length of each side along the side's path."""
@@ -179,6 +298,15 @@ class JigsawPiece(object):
         length += util.distance(coord, side[coord_index - 1])
       self.side_lengths.append(length)
 
+  def find_side_signatures(self):
+    """Describe each side's shape with a compact signature.
+
+    Signatures are cheap to compare, so they can rule out most candidate
+    matches before any point-by-point comparison.  See util.side_signature.
+    """
+    self.side_signatures = [
+      util.side_signature(side).tolist() for side in self.sides]
+
   def find_side_types(self, percent_diff_threshold=0.08):
     """Detect if each side is in, out or flat."""
     for side in self.sides:
@@ -200,8 +328,12 @@ class JigsawPiece(object):
         side_type = 'in'
       self.side_types.append(side_type)
 
-  def template_corners(self, segment_size=30, number_of_candidate_corners=80):
-    """Use a right angle template and Hausdorff comparison to find corners."""
+  def template_corners(self, segment_size=30, number_of_candidate_corners=80,
+                       verbose=True):
+    """Use a right angle template and Hausdorff comparison to find corners.
+
+    Progress is printed as the outline is scored, unless verbose is False.
+    """
     for index, point in enumerate(self.outline):
       # Get a slice of the curve with the indexed point in the middle.
       roll_point = segment_size / 2 - index
@@ -238,14 +370,23 @@ class JigsawPiece(object):
       # for the index.
       self.hausdorff_scores.append([index, point, max(segment_scores)])
       # Track progress.
-      if index % 100 == 0:
+      if verbose and index % 100 == 0:
         print '%0.2f%% complete' % (100. * index / len(self.outline))
-    # After analyzing the whole outline, grab the min Hausdorff scores and set
-    # them as candidate corners.
+    self.choose_candidate_corners(number_of_candidate_corners)
+    if self.low_memory:
+      self.hausdorff_scores = records.hausdorff_score_array(
+        self.hausdorff_scores)
+
+  def choose_candidate_corners(self, number_of_candidate_corners=80):
+    """Take the points with the lowest Hausdorff scores as candidate corners.
+
+    This is the last step of template_corners, split out so that the number
+    of candidates can be changed without scoring the outline again.
+    """
     best_scores = sorted(self.hausdorff_scores, key=lambda e: e[2])
     best_scores = best_scores[0:number_of_candidate_corners]
-    for _, point, _ in best_scores:
-      self.candidate_corners.append(point)
+    self.candidate_corner_indices = [index for index, _, _ in best_scores]
+    self.candidate_corners = [point for _, point, _ in best_scores]
 
   def find_bounding_boxes(self):
     """Define the bounding boxes around non-flat sides.
@@ -0,0 +1,185 @@
+"""Pipeline stages shared by the scripts and the command line interface.
+
+Each stage works on in-memory data, so stages can be chained in one process
+without writing and re-reading images and json between them.
+"""
+
+import json
+import os
+
+import numpy as np
+
+from quandry import records
+from quandry import util
+from quandry.piece import JigsawPiece
+
+
+def output_path(filepath, suffix, outdir=None):
+  """Build an output filepath like '<outdir>/<name><suffix>'.
+
+  Outputs are saved next to the input file unless an outdir is given.
+  """
+  extensionless_filename = os.path.basename(filepath).split('.')[0]
+  directory = outdir or os.path.dirname(filepath)
+  if directory and not os.path.exists(directory):
+    os.makedirs(directory)
+  return os.path.join(directory, '%s%s' % (extensionless_filename, suffix))
+
+
+def load_image(filepath):
+  """Decode an image file into an RGB array."""
+  from PIL import Image
+  return np.array(Image.open(filepath).convert('RGB'))
+
+
+def save_image(image, filepath):
+  """Encode an image array to a file."""
+  from PIL import Image
+  Image.fromarray(image).save(filepath)
+
+
+def enhance_image(image, cutoff=0):
+  """Maximize the contrast of an RGB image array."""
+  return util.autocontrast(image, cutoff)
+
+
+def enhance_file(filepath, outpath, cutoff=0):
+  """Save an enhanced copy of an image file."""
+  save_image(enhance_image(load_image(filepath), cutoff), outpath)
+
+
+def _enhance_file(arguments):
+  """Unpack arguments for enhance_file when run on a process pool."""
+  return enhance_file(*arguments)
+
+
+def enhance_files(filepaths, outpaths, cutoff=0, processes=None):
+  """Enhance many image files in parallel.
+
+  A single file, or a single process, is handled in this process, so that
+  starting a pool doesn't slow down small runs.
+  """
+  jobs = [(filepath, outpath, cutoff)
+          for filepath, outpath in zip(filepaths, outpaths)]
+  if len(jobs) <= 1 or processes == 1:
+    for job in jobs:
+      _enhance_file(job)
+    return
+  import multiprocessing
+  pool = multiprocessing.Pool(processes)
+  try:
+    pool.map(_enhance_file, jobs)
+  finally:
+    pool.close()
+    pool.join()
+
+
+def outline_piece(piece, low_threshold=50, high_threshold=110, smoothing=0):
+  """Find a piece's outline, returning the outline data."""
+  piece.segment(low_threshold=low_threshold, high_threshold=high_threshold,
+                smoothing=smoothing)
+  return {
+    'outline': piece.outline.tolist(),
+  }
+
+
+def analyze_piece(piece, low_threshold=50, high_threshold=110, smoothing=0):
+  """Run every analysis stage on a piece, returning the piece data.
+
+  The piece data has the same layout as the json saved by the 'analyze'
+  script, minus the raw image.
+  """
+  piece_data = outline_piece(piece, low_threshold, high_threshold, smoothing)
+  piece.find_center()
+  piece.template_corners()
+  piece.find_true_corners()
+  piece.find_sides()
+  piece.find_side_lengths()
+  piece.find_side_types()
+  piece.find_side_signatures()
+  piece.find_bounding_boxes()
+  piece_data.update({
+    'enhancement': piece.enhancement,
+    'center': piece.center,
+    'corners': [list(c) for c in piece.corners],
+    'corner_indices': [int(i) for i in piece.corner_indices],
+    'sides': [s.tolist() for s in piece.sides],
+    'side_lengths': piece.side_lengths,
+    'side_types': piece.side_types,
+    'side_signatures': piece.side_signatures,
+  })
+  return piece_data
+
+
+def crop_image(image, outline):
+  """Make everything outside of a piece's outline transparent.
+
+  Returns an RGBA image array.  Outlines use (x, -y) coordinates, so they're
+  flipped back into (row, col) image coordinates first.
+  """
+  from skimage import measure
+  rows, cols = image.shape[0:2]
+  outline = np.array(outline)
+  vertices = np.column_stack((-outline[:, 1], outline[:, 0]))
+  inside = measure.grid_points_in_poly((rows, cols), vertices)
+  cropped = np.zeros((rows, cols, 4), dtype=np.uint8)
+  cropped[:, :, 0:3] = image[:, :, 0:3]
+  cropped[:, :, 3] = 255
+  cropped[~inside] = (255, 255, 255, 0)
+  return cropped
+
+
+def report_fits(matcher):
+  """Print the ranked candidates for each in side."""
+  for name in sorted(matcher.sides):
+    if matcher.sides[name].type != 'in':
+      continue
+    print 'candidates for "%s"..' % name
+    for candidate, score in matcher.ranked_candidates(name):
+      print '%10s -> %0.2f' % (candidate.split('/')[-1], score)
+
+
+def run(filepaths, matcher, enhance=True, low_threshold=50,
+        high_threshold=110, outdir=None, save_enhanced=False,
+        save_cropped=False, cutoff=0, clahe=False, low_memory=False):
+  """Enhance, analyze and crop each image, then fit the pieces together.
+
+  Images are decoded once and every intermediate stays in memory, and the
+  matcher is given a summary of each piece rather than its piece data.  Only
+  the requested outputs are written.  Enhancement settings are recorded in the
+  piece data.  In low memory mode, each piece's images are released once it
+  has been analyzed and cropped.
+
+  Pieces the matcher already knows, say from an earlier run, are replaced.
+
+  Returns the piece data for each piece that was analyzed, keyed by filepath.
+  """
+  all_piece_data = {}
+  for filepath in filepaths:
+    print 'processing "%s"..' % filepath
+    piece = JigsawPiece(
+      filepath, low_memory=low_memory, image=load_image(filepath))
+    if enhance:
+      piece.enhance(cutoff=cutoff, clahe=clahe)
+      if save_enhanced:
+        save_image(piece.raw_image,
+                   output_path(filepath, '-enhanced.png', outdir))
+    try:
+      piece_data = analyze_piece(piece, low_threshold, high_threshold)
+    except Exception as error:
+      print 'could not analyze "%s": %s' % (filepath, error)
+      continue
+    if save_cropped:
+      save_image(crop_image(piece.raw_image, piece_data['outline']),
+                 output_path(filepath, '-cropped.png', outdir))
+    if low_memory:
+      piece.release_images()
+    matcher.add_summary(records.PieceSummary.from_piece(filepath, piece))
+    all_piece_data[filepath] = piece_data
+  return all_piece_data
+
+
+def save_piece_data(piece_data, filepath):
+  """Save piece data as json."""
+  with open(filepath, 'w') as piece_data_file:
+    piece_data_file.write(json.dumps(piece_data))
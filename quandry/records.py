@@ -0,0 +1,134 @@
+"""Compact records for holding many analyzed pieces in memory.
+
+A JigsawPiece keeps its images and every intermediate result around.  Once a
+piece has been analyzed, the matching stage only needs its sides, so pieces
+can be converted to a PieceSummary and the JigsawPiece dropped.
+"""
+
+import numpy as np
+
+from quandry import util
+
+
+# One row per outline point, replacing JigsawPiece.hausdorff_scores.
+HAUSDORFF_SCORE_DTYPE = np.dtype([
+  ('index', np.int32),
+  ('point', np.float32, (2,)),
+  ('score', np.float32),
+])
+
+# One row per rectangle candidate, replacing JigsawPiece.areas.
+RECT_CANDIDATE_DTYPE = np.dtype([
+  ('corners', np.int16, (4,)),
+  ('area', np.float32),
+])
+
+
+def hausdorff_score_array(hausdorff_scores):
+  """Pack [index, point, score] lists into a structured array."""
+  scores = np.zeros(len(hausdorff_scores), dtype=HAUSDORFF_SCORE_DTYPE)
+  for row, (index, point, score) in enumerate(hausdorff_scores):
+    scores[row] = (index, point, score)
+  return scores
+
+
+def rect_candidate_array(areas):
+  """Pack [rect, area] lists into a structured array."""
+  rects = np.zeros(len(areas), dtype=RECT_CANDIDATE_DTYPE)
+  for row, (rect, area) in enumerate(areas):
+    rects[row] = (rect, area)
+  return rects
+
+
+class Side(object):
+  """A single side of a piece, with just what's needed for matching.
+
+  Each side is compared against many others, so its canonical form from
+  util.align_side is kept once it's needed: the aligned form for in sides and
+  the translated form for out sides.  Neither is saved by to_dict.
+  """
+
+  __slots__ = (
+    'name', 'piece', 'index', 'type', 'length', 'outline', 'signature',
+    '_aligned', '_translated')
+
+  def __init__(self, piece, index, side_type, length, outline,
+               signature=None):
+    self.name = '%s+%s' % (piece, index)
+    self.piece = piece
+    self.index = index
+    self.type = side_type
+    self.length = length
+    self.outline = np.asarray(outline, dtype=np.float32)
+    # Signatures are computed at analysis time, but older piece data may not
+    # have them.
+    if signature is None:
+      signature = util.side_signature(outline)
+    self.signature = np.asarray(signature, dtype=np.float32)
+    self._aligned = None
+    self._translated = None
+
+  @property
+  def aligned(self):
+    """The side's aligned form, for comparing it as line a."""
+    if self._aligned is None:
+      self._aligned = util.align_side(self.outline)[0].astype(np.float32)
+    return self._aligned
+
+  @property
+  def translated(self):
+    """The side's translated form, for comparing it as line b."""
+    if self._translated is None:
+      self._translated = self.outline - self.outline[0]
+    return self._translated
+
+  def to_dict(self):
+    """Convert to a json-serializable dict."""
+    return {
+      'piece': self.piece,
+      'index': self.index,
+      'type': self.type,
+      'length': self.length,
+      'outline': self.outline.tolist(),
+      'signature': self.signature.tolist(),
+    }
+
+  @classmethod
+  def from_dict(cls, data):
+    """Restore a side converted with Side.to_dict."""
+    return cls(data['piece'], data['index'], data['type'], data['length'],
+               data['outline'], data.get('signature'))
+
+
+class PieceSummary(object):
+  """The parts of an analyzed piece that the matching stage needs."""
+
+  __slots__ = ('name', 'center', 'corners', 'sides')
+
+  def __init__(self, name, center, corners, sides):
+    self.name = name
+    self.center = np.asarray(center, dtype=np.float32)
+    self.corners = np.asarray(corners, dtype=np.float32)
+    self.sides = tuple(sides)
+
+  @classmethod
+  def from_data(cls, name, piece_data):
+    """Summarize piece data, as generated by the 'analyze' script."""
+    signatures = piece_data.get(
+      'side_signatures', [None] * len(piece_data['sides']))
+    sides = [
+      Side(name, index, piece_data['side_types'][index],
+           piece_data['side_lengths'][index], outline, signatures[index])
+      for index, outline in enumerate(piece_data['sides'])]
+    return cls(name, piece_data.get('center', []),
+               piece_data.get('corners', []), sides)
+
+  @classmethod
+  def from_piece(cls, name, piece):
+    """Summarize an analyzed JigsawPiece."""
+    signatures = piece.side_signatures or [None] * len(piece.sides)
+    sides = [
+      Side(name, index, piece.side_types[index], piece.side_lengths[index],
+           outline, signatures[index])
+      for index, outline in enumerate(piece.sides)]
+    return cls(name, piece.center, piece.corners, sides)
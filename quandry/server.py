@@ -0,0 +1,253 @@
+"""A job server for analyzing piece images sent from capture stations.
+
+Images are POSTed to /pieces and the piece data is sent back as json once the
+analysis finishes.  Analysis runs on a bounded process pool, off the threads
+that handle requests.  When too many images are already waiting, new ones are
+turned away with a 503 so that bursts from the cameras can't pile up work or
+memory.  Images that take too long to analyze are given up on with a 504.
+Queue depth and latency metrics are served from /metrics.
+"""
+
+import BaseHTTPServer
+import collections
+import json
+import math
+import multiprocessing
+import pickle
+import SocketServer
+import StringIO
+import threading
+import time
+import urlparse
+
+import numpy as np
+
+
+class QueueFull(Exception):
+  """Raised when a job is submitted to a queue that's already full."""
+
+
+class JobTimeout(Exception):
+  """Raised when a job doesn't finish within the queue's timeout."""
+
+
+def analyze_image_bytes(image_bytes, name, low_threshold=50,
+                        high_threshold=110):
+  """Decode and analyze an image in a worker process."""
+  from PIL import Image
+  from quandry import pipeline
+  from quandry.piece import JigsawPiece
+  image = np.array(Image.open(StringIO.StringIO(image_bytes)).convert('RGB'))
+  piece = JigsawPiece(name, image=image)
+  return pipeline.analyze_piece(piece, low_threshold, high_threshold)
+
+
+def run_job(function, args):
+  """Run a job in a worker process, returning its outcome rather than raising.
+
+  multiprocessing only calls a result's callback when the job succeeds, so
+  errors are passed back as ('error', exception) instead of being raised.
+  """
+  try:
+    return 'result', function(*args)
+  except Exception as error:
+    try:
+      pickle.dumps(error)
+    except Exception:
+      error = Exception(str(error))
+    return 'error', error
+
+
+class AnalysisQueue(object):
+  """Runs jobs on a process pool, admitting a bounded number at a time.
+
+  Jobs beyond the pool's size wait in the pool's queue.  Once max_pending
+  jobs are waiting or running, submit raises QueueFull instead of queueing
+  more.  If timeout is set, a job that hasn't finished after that many
+  seconds counts as failed and submit raises JobTimeout.  The worker running
+  it can't be interrupted, though, so the job keeps its place in the queue
+  until it actually ends.
+  """
+
+  def __init__(self, processes=None, max_pending=None,
+               function=analyze_image_bytes, timeout=None):
+    self.processes = processes or multiprocessing.cpu_count()
+    self.max_pending = max_pending or 2 * self.processes
+    self.function = function
+    self.timeout = timeout
+    self.pool = multiprocessing.Pool(self.processes)
+    self.lock = threading.Lock()
+    self.pending = 0
+    self.completed = 0
+    self.failed = 0
+    self.rejected = 0
+    self.timed_out = 0
+    # Seconds from submission to result for the most recent jobs.
+    self.latencies = collections.deque(maxlen=1000)
+
+  def reserve(self):
+    """Take a place in the queue for a job, or raise QueueFull.
+
+    The place must be used with run_reserved, or given back with release.
+    """
+    with self.lock:
+      if self.pending >= self.max_pending:
+        self.rejected += 1
+        raise QueueFull()
+      self.pending += 1
+
+  def release(self, outcome=None):
+    """Give back a place in the queue once its job has ended."""
+    with self.lock:
+      self.pending -= 1
+
+  def submit(self, *args):
+    """Run a job and wait for its result.
+
+    Raises QueueFull if the queue is full, JobTimeout if the job took too
+    long, or re-raises the job's exception if it failed.
+    """
+    self.reserve()
+    return self.run_reserved(*args)
+
+  def run_reserved(self, *args):
+    """Run a job in a place already taken with reserve, as in submit."""
+    start = time.time()
+    try:
+      async_result = self.pool.apply_async(
+        run_job, (self.function, args), callback=self.release)
+    except Exception:
+      self.release()
+      raise
+    try:
+      status, value = async_result.get(self.timeout)
+    except multiprocessing.TimeoutError:
+      status, value = 'timeout', None
+    with self.lock:
+      self.latencies.append(time.time() - start)
+      if status == 'result':
+        self.completed += 1
+      else:
+        self.failed += 1
+      if status == 'timeout':
+        self.timed_out += 1
+    if status == 'timeout':
+      raise JobTimeout()
+    if status == 'error':
+      raise value
+    return value
+
+  def metrics(self):
+    """Get a snapshot of the queue's depth, throughput and latency."""
+    with self.lock:
+      latencies = sorted(self.latencies)
+      metrics = {
+        'processes': self.processes,
+        'max_pending': self.max_pending,
+        'running': min(self.pending, self.processes),
+        'queue_depth': max(self.pending - self.processes, 0),
+        'completed': self.completed,
+        'failed': self.failed,
+        'rejected': self.rejected,
+        'timed_out': self.timed_out,
+      }
+    if latencies:
+      metrics['latency'] = {
+        'mean': sum(latencies) / len(latencies),
+        'median': latencies[len(latencies) / 2],
+        'p95': latencies[int(math.ceil(0.95 * len(latencies))) - 1],
+        'max': latencies[-1],
+      }
+    return metrics
+
+  def close(self):
+    """Stop the worker processes."""
+    self.pool.terminate()
+    self.pool.join()
+
+
+class AnalysisRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+  """Handles image submissions and metrics requests."""
+
+  def do_GET(self):
+    if urlparse.urlparse(self.path).path != '/metrics':
+      return self.send_json(404, {'error': 'not found'})
+    self.send_json(200, self.server.queue.metrics())
+
+  def do_POST(self):
+    url = urlparse.urlparse(self.path)
+    if url.path != '/pieces':
+      return self.send_json(404, {'error': 'not found'})
+    length = int(self.headers.getheader('content-length') or 0)
+    if not length:
+      return self.send_json(400, {'error': 'no image was sent'})
+    if length > self.server.max_image_bytes:
+      return self.send_json(413, {'error': 'image is too large'})
+    query = urlparse.parse_qs(url.query)
+    name = query.get('name', ['piece'])[0]
+    # Take a place in the queue before reading the image, so that images
+    # which would be turned away are never buffered.
+    try:
+      self.server.queue.reserve()
+    except QueueFull:
+      return self.send_json(503, {'error': 'too many pending images'},
+                            headers={'Retry-After': '1'})
+    try:
+      image_bytes = self.rfile.read(length)
+    except Exception:
+      self.server.queue.release()
+      raise
+    try:
+      piece_data = self.server.queue.run_reserved(image_bytes, name)
+    except JobTimeout:
+      return self.send_json(504, {'error': 'analyzing "%s" took too long' % (
+        name)})
+    except Exception as error:
+      return self.send_json(422, {'error': 'could not analyze "%s": %s' % (
+        name, error)})
+    self.send_json(200, piece_data)
+
+  def send_json(self, status, data, headers=None):
+    """Send a json response."""
+    body = json.dumps(data)
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(body)))
+    for key, value in (headers or {}).items():
+      self.send_header(key, value)
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    """Keep request logs quiet unless the server is verbose."""
+    if self.server.verbose:
+      BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+class AnalysisServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+  """An HTTP server that hands images off to an AnalysisQueue."""
+
+  daemon_threads = True
+
+  def __init__(self, address, queue, max_image_bytes=20 * 1024 * 1024,
+               verbose=False):
+    BaseHTTPServer.HTTPServer.__init__(self, address, AnalysisRequestHandler)
+    self.queue = queue
+    self.max_image_bytes = max_image_bytes
+    self.verbose = verbose
+
+
+def serve(host='127.0.0.1', port=8000, processes=None, max_pending=None,
+          timeout=None):
+  """Run the job server until interrupted."""
+  queue = AnalysisQueue(processes, max_pending, timeout=timeout)
+  server = AnalysisServer((host, port), queue, verbose=True)
+  print 'serving on http://%s:%s with %s processes..' % (
+    host, port, queue.processes)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    queue.close()
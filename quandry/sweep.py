@@ -0,0 +1,162 @@
+"""Sweeping analysis parameters over many pieces.
+
+Each analysis stage only depends on some of the parameters, so a sweep is run
+as a tree of stages: a stage's result is keyed by the parameters it and the
+stages before it depend on, computed once, and shared by every variant further
+down.  For example, sweeping the side type threshold over ten values segments
+each piece and finds its corners once, not ten times.
+
+Pieces are swept in parallel, one piece per process.
+"""
+
+import copy
+import itertools
+import os
+
+from quandry.piece import JigsawPiece
+
+
+# The parameters each stage depends on, and the piece attributes it sets.
+# Stages run in this order.
+STAGES = (
+  ('outline', ('low_threshold', 'high_threshold', 'smoothing'),
+   ('segmentation', 'outline', 'center')),
+  ('corner_scores', ('segment_size',),
+   ('hausdorff_scores',)),
+  ('candidate_corners', ('number_of_candidate_corners',),
+   ('candidate_corners', 'candidate_corner_indices')),
+  ('corners', ('center_dist_threshold', 'angle_threshold'),
+   ('angles', 'corner_sets', 'areas', 'corners', 'corner_indices')),
+  ('sides', (),
+   ('sides', 'side_lengths')),
+  ('side_types', ('percent_diff_threshold',),
+   ('mean_side_points', 'side_types')),
+)
+
+DEFAULTS = {
+  'low_threshold': 50,
+  'high_threshold': 110,
+  'smoothing': 0,
+  'segment_size': 30,
+  'number_of_candidate_corners': 80,
+  'center_dist_threshold': 0.3,
+  'angle_threshold': 0.4,
+  'percent_diff_threshold': 0.08,
+}
+
+PARAMETERS = tuple(name for _, names, _ in STAGES for name in names)
+
+
+def run_stage(piece, stage, params):
+  """Run one stage on a piece with the given parameters."""
+  if stage == 'outline':
+    piece.segment(low_threshold=params['low_threshold'],
+                  high_threshold=params['high_threshold'],
+                  smoothing=params['smoothing'])
+    piece.find_center()
+  elif stage == 'corner_scores':
+    # Scoring is all of template_corners but choosing the candidates.
+    # Progress isn't printed, since the sweep's table may be on stdout.
+    piece.template_corners(segment_size=params['segment_size'], verbose=False)
+  elif stage == 'candidate_corners':
+    piece.choose_candidate_corners(params['number_of_candidate_corners'])
+  elif stage == 'corners':
+    piece.find_true_corners(params['center_dist_threshold'],
+                            params['angle_threshold'])
+  elif stage == 'sides':
+    piece.find_sides()
+    piece.find_side_lengths()
+  elif stage == 'side_types':
+    piece.find_side_types(params['percent_diff_threshold'])
+
+
+def branch(piece, attributes):
+  """Copy a piece so a stage can set attributes without touching the original.
+
+  The copy is shallow, so images and earlier results are shared.
+  """
+  piece = copy.copy(piece)
+  for attribute in attributes:
+    setattr(piece, attribute, [])
+  return piece
+
+
+def expand_grid(grid):
+  """Turn a dict of parameter values into a list of full parameter dicts.
+
+  Parameters missing from the grid take their default values.
+  """
+  for name in grid:
+    if name not in DEFAULTS:
+      raise ValueError('unknown parameter "%s"' % name)
+  names = sorted(grid)
+  variants = []
+  for values in itertools.product(*[grid[name] for name in names]):
+    params = dict(DEFAULTS)
+    params.update(zip(names, values))
+    variants.append(params)
+  return variants
+
+
+def sweep_piece(filepath, variants):
+  """Analyze one piece with every variant of the parameters.
+
+  Returns a row for each variant, and how many times each stage ran.
+  """
+  root = JigsawPiece(filepath)
+  results = {}
+  stage_runs = dict((stage, 0) for stage, _, _ in STAGES)
+  rows = []
+  for params in variants:
+    piece = root
+    key = ()
+    error = None
+    for stage, names, attributes in STAGES:
+      key += tuple(params[name] for name in names)
+      if (stage, key) not in results:
+        if error is None:
+          piece = branch(piece, attributes)
+          try:
+            run_stage(piece, stage, params)
+          except Exception as stage_error:
+            error = '%s: %s' % (stage, stage_error)
+          stage_runs[stage] += 1
+        results[(stage, key)] = (piece, error)
+      piece, error = results[(stage, key)]
+    row = {'piece': os.path.basename(filepath), 'error': error}
+    row.update((name, params[name]) for name in PARAMETERS)
+    if error is None:
+      row['corners'] = [[float(c[0]), float(c[1])] for c in piece.corners]
+      row['side_types'] = list(piece.side_types)
+      row['side_lengths'] = [float(l) for l in piece.side_lengths]
+    rows.append(row)
+  return rows, stage_runs
+
+
+def _sweep_piece(arguments):
+  """Unpack arguments for sweep_piece when run on a process pool."""
+  return sweep_piece(*arguments)
+
+
+def sweep(filepaths, grid, processes=None):
+  """Analyze each piece with every combination of the grid's parameters.
+
+  Returns a table with a row for each piece and variant, and the total number
+  of times each stage ran.
+  """
+  import multiprocessing
+  variants = expand_grid(grid)
+  pool = multiprocessing.Pool(processes)
+  try:
+    results = pool.map(
+      _sweep_piece, [(filepath, variants) for filepath in filepaths])
+  finally:
+    pool.close()
+    pool.join()
+  table = []
+  stage_runs = dict((stage, 0) for stage, _, _ in STAGES)
+  for rows, piece_stage_runs in results:
+    table.extend(rows)
+    for stage in piece_stage_runs:
+      stage_runs[stage] += piece_stage_runs[stage]
+  return table, stage_runs
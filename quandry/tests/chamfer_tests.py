@@ -0,0 +1,37 @@
+"""Tests for quandry.chamfer.ChamferReference."""
+
+import unittest
+
+from quandry import chamfer
+from quandry.tests.matcher_tests import make_side
+
+
+class ChamferReferenceTest(unittest.TestCase):
+  """Scoring candidates against a rasterized reference side."""
+
+  def setUp(self):
+    self.reference = chamfer.ChamferReference(make_side(30, -5))
+
+  def test_identical_side(self):
+    """A side matches itself."""
+    self.assertAlmostEqual(0, self.reference.score(make_side(30, -5)))
+
+  def test_reflected_side(self):
+    """Sides are compared in their reflected form as well."""
+    self.assertAlmostEqual(0, self.reference.score(make_side(30, 5)))
+
+  def test_translated_side(self):
+    """Sides are aligned at their first point before scoring."""
+    side = [[x + 100, y - 40] for x, y in make_side(30, -5)]
+    self.assertAlmostEqual(0, self.reference.score(side))
+
+  def test_worse_fits_score_higher(self):
+    """Bigger differences in shape give bigger scores."""
+    close = self.reference.score(make_side(30, -6))
+    far = self.reference.score(make_side(30, -15))
+    self.assertTrue(0 < close < far)
+
+  def test_points_beyond_the_image(self):
+    """Candidate points far from the reference are still scored."""
+    side = [[0., 0.], [30., 0.], [30., 100.]]
+    self.assertTrue(self.reference.score(side) > 20)
@@ -0,0 +1,44 @@
+"""Tests for quandry.cli."""
+
+import os
+import tempfile
+import unittest
+
+from quandry import cli
+from quandry import SideMatcher
+
+
+def matcher_args(matcher_path, top=None, chamfer=False, signatures=None):
+  """Build the matcher options as docopt would parse them."""
+  return {
+    '--matcher': matcher_path,
+    '--top': top,
+    '--chamfer': chamfer,
+    '--signatures': signatures,
+  }
+
+
+class LoadMatcherTest(unittest.TestCase):
+  """Restoring a saved matcher from the command line options."""
+
+  def setUp(self):
+    handle, self.matcher_path = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    SideMatcher(top_k=3).save(self.matcher_path)
+
+  def tearDown(self):
+    os.remove(self.matcher_path)
+
+  def test_matching_options(self):
+    """Options that agree with the saved settings are fine."""
+    matcher = cli.load_matcher(matcher_args(self.matcher_path, top='3'))
+    self.assertEqual(3, matcher.top_k)
+    matcher = cli.load_matcher(matcher_args(self.matcher_path))
+    self.assertEqual(3, matcher.top_k)
+
+  def test_conflicting_options(self):
+    """Options that would change the saved settings are an error."""
+    for args in (matcher_args(self.matcher_path, top='5'),
+                 matcher_args(self.matcher_path, chamfer=True),
+                 matcher_args(self.matcher_path, signatures='0.2')):
+      self.assertRaises(SystemExit, cli.load_matcher, args)
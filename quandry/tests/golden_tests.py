@@ -0,0 +1,58 @@
+"""Tests for quandry.golden, and of the pipeline against the golden results.
+
+Checking every sample piece takes a while, so it's only done when the
+QUANDRY_GOLDEN environment variable is set.
+"""
+
+import copy
+import os
+import unittest
+
+from quandry import golden
+
+
+class CompareTest(unittest.TestCase):
+  """Comparing results against the golden ones within tolerances."""
+
+  def setUp(self):
+    self.expected = golden.load()
+
+  def test_identical(self):
+    """Golden results match themselves."""
+    self.assertEqual([], golden.compare(self.expected, self.expected))
+
+  def test_tolerances(self):
+    """Small numeric differences are allowed, but changed results aren't."""
+    actual = copy.deepcopy(self.expected)
+    piece = actual['pieces']['1.jpg']
+    piece['corners'][0][0] += 1
+    piece['side_lengths'][0] *= 1.01
+    self.assertEqual([], golden.compare(self.expected, actual))
+    piece['corners'][0][0] += 10
+    piece['side_types'][0] = 'in'
+    self.assertEqual(2, len(golden.compare(self.expected, actual)))
+
+  def test_fits(self):
+    """A different best fit is a difference."""
+    actual = copy.deepcopy(self.expected)
+    fits = actual['fits']['11.jpg+1']
+    fits[0], fits[1] = fits[1], fits[0]
+    problems = golden.compare(self.expected, actual)
+    self.assertEqual(1, len(problems))
+    self.assertTrue(problems[0].startswith('11.jpg+1: expected best fit'))
+
+
+class PipelineTest(unittest.TestCase):
+  """Running the pipeline and checking it against the golden results."""
+
+  def test_one_piece(self):
+    """A single piece's analysis matches the golden results."""
+    filepath = os.path.join(golden.SAMPLE_PIECES, '8.jpg')
+    actual, _ = golden.run([filepath], fits=False)
+    self.assertEqual([], golden.compare(golden.load(), actual))
+
+  @unittest.skipUnless(os.environ.get('QUANDRY_GOLDEN'), 'slow')
+  def test_sample_pieces(self):
+    """Every sample piece's analysis and fits match the golden results."""
+    actual, _ = golden.run(golden.sample_filepaths())
+    self.assertEqual([], golden.compare(golden.load(), actual))
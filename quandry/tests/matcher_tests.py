@@ -0,0 +1,148 @@
+"""Tests for quandry.matcher.SideMatcher."""
+
+import os
+import tempfile
+import unittest
+
+from quandry import SideMatcher
+
+
+def make_side(length, bump):
+  """Generate a side along the x-axis with a bump in the middle."""
+  points = []
+  for x in range(length + 1):
+    y = bump if length / 3 < x < 2 * length / 3 else 0
+    points.append([float(x), float(y)])
+  return points
+
+
+def make_piece(side_types, lengths, bump=5):
+  """Generate piece data with the given side types and lengths."""
+  sides = []
+  for side_type, length in zip(side_types, lengths):
+    if side_type == 'in':
+      sides.append(make_side(length, -bump))
+    else:
+      sides.append(make_side(length, bump))
+  return {
+    'sides': sides,
+    'side_types': side_types,
+    'side_lengths': [float(length) for length in lengths],
+  }
+
+
+class SideMatcherTest(unittest.TestCase):
+  """Adding pieces one at a time."""
+
+  def setUp(self):
+    self.matcher = SideMatcher()
+    self.matcher.add_piece('a', make_piece(
+      ['in', 'out', 'flat', 'flat'], [30, 30, 30, 30]))
+
+  def test_pieces_are_not_compared_with_themselves(self):
+    """A single piece has no candidates."""
+    self.assertEqual([], self.matcher.ranked_candidates('a+0'))
+    self.assertEqual({}, self.matcher.scores)
+
+  def test_only_new_pairs_are_scored(self):
+    """Adding a piece scores its sides against complementary sides."""
+    self.matcher.add_piece('b', make_piece(
+      ['out', 'in', 'flat', 'flat'], [30, 31, 30, 30]))
+    scored = self.matcher.add_piece('c', make_piece(
+      ['out', 'flat', 'flat', 'flat'], [30, 30, 30, 30]))
+    self.assertEqual(
+      sorted([('a+0', 'c+0'), ('b+1', 'c+0')]), sorted(scored))
+    self.assertEqual(
+      ['b+0', 'c+0'],
+      sorted(name for name, _ in self.matcher.ranked_candidates('a+0')))
+
+  def test_length_threshold(self):
+    """Sides with very different lengths are not scored."""
+    scored = self.matcher.add_piece('b', make_piece(
+      ['out', 'in', 'flat', 'flat'], [60, 15, 30, 30]))
+    self.assertEqual([], scored)
+
+  def test_candidates_are_ranked(self):
+    """Better-fitting sides come first."""
+    self.matcher.add_piece('b', make_piece(
+      ['out', 'flat', 'flat', 'flat'], [30, 30, 30, 30], bump=5))
+    self.matcher.add_piece('c', make_piece(
+      ['out', 'flat', 'flat', 'flat'], [30, 30, 30, 30], bump=12))
+    ranked = self.matcher.ranked_candidates('a+0')
+    self.assertEqual(['b+0', 'c+0'], [name for name, _ in ranked])
+    self.assertTrue(ranked[0][1] <= ranked[1][1])
+
+  def test_save_and_load(self):
+    """Saved state can be restored and extended."""
+    self.matcher.add_piece('b', make_piece(
+      ['out', 'in', 'flat', 'flat'], [30, 30, 30, 30]))
+    handle, filepath = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+      self.matcher.save(filepath)
+      restored = SideMatcher.load(filepath)
+    finally:
+      os.remove(filepath)
+    self.assertEqual(
+      self.matcher.ranked_candidates('a+0'), restored.ranked_candidates('a+0'))
+    scored = restored.add_piece('c', make_piece(
+      ['in', 'flat', 'flat', 'flat'], [30, 30, 30, 30]))
+    self.assertEqual(sorted([('c+0', 'a+1'), ('c+0', 'b+0')]), sorted(scored))
+
+  def test_readding_a_piece_replaces_it(self):
+    """A piece added again is only indexed and ranked once."""
+    self.matcher.add_piece('b', make_piece(
+      ['out', 'in', 'flat', 'flat'], [30, 30, 30, 30]))
+    scored = self.matcher.add_piece('b', make_piece(
+      ['out', 'in', 'flat', 'flat'], [30, 30, 30, 30], bump=6))
+    self.assertEqual(sorted([('a+0', 'b+0'), ('b+1', 'a+1')]), sorted(scored))
+    self.assertEqual(
+      ['b+0'], [name for name, _ in self.matcher.ranked_candidates('a+0')])
+    self.assertEqual(
+      [(30.0, 'a+1'), (30.0, 'b+0')], self.matcher.lengths['out'])
+    self.assertEqual(2, len(self.matcher.scores))
+    self.assertEqual(
+      ['b+0', 'b+1', 'b+2', 'b+3'], sorted(self.matcher.pieces['b']))
+    self.matcher.add_piece('c', make_piece(
+      ['in', 'flat', 'flat', 'flat'], [30, 30, 30, 30]))
+    self.assertEqual(
+      ['a+1', 'b+0'],
+      sorted(name for name, _ in self.matcher.ranked_candidates('c+0')))
+
+
+class TopKSideMatcherTest(unittest.TestCase):
+  """Keeping only the best candidates with bounded scoring."""
+
+  def test_top_k_matches_full_ranking(self):
+    """Bounded scoring finds the same best candidates as full scoring."""
+    full_matcher = SideMatcher()
+    top_matcher = SideMatcher(top_k=2)
+    for name, bump in (('a', 5), ('b', 4), ('c', 12), ('d', 6), ('e', 20)):
+      side_types = ['out', 'flat', 'flat', 'flat']
+      if name == 'a':
+        side_types = ['in', 'flat', 'flat', 'flat']
+      piece_data = make_piece(side_types, [30, 30, 30, 30], bump=bump)
+      full_matcher.add_piece(name, piece_data)
+      top_matcher.add_piece(name, piece_data)
+    ranked = top_matcher.ranked_candidates('a+0')
+    expected = full_matcher.ranked_candidates('a+0', limit=2)
+    self.assertEqual(['b+0', 'd+0'], [name for name, _ in ranked])
+    self.assertEqual([name for name, _ in expected], [n for n, _ in ranked])
+    for (_, expected_score), (_, score) in zip(expected, ranked):
+      self.assertAlmostEqual(expected_score, score)
+
+
+class SignatureSideMatcherTest(unittest.TestCase):
+  """Pre-filtering candidates by signature."""
+
+  def test_dissimilar_signatures_are_skipped(self):
+    matcher = SideMatcher(signature_threshold=0.05)
+    matcher.add_piece('a', make_piece(
+      ['in', 'flat', 'flat', 'flat'], [30, 30, 30, 30], bump=5))
+    matcher.add_piece('b', make_piece(
+      ['out', 'flat', 'flat', 'flat'], [30, 30, 30, 30], bump=5))
+    scored = matcher.add_piece('c', make_piece(
+      ['out', 'flat', 'flat', 'flat'], [30, 30, 30, 30], bump=20))
+    self.assertEqual([], scored)
+    self.assertEqual(
+      ['b+0'], [name for name, _ in matcher.ranked_candidates('a+0')])
@@ -0,0 +1,125 @@
+"""Tests for JigsawPiece."""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from quandry import golden
+from quandry import pipeline
+from quandry import records
+from quandry import util
+from quandry.piece import JigsawPiece
+
+
+class NormalizeOutlineTest(unittest.TestCase):
+  """Giving outlines a deterministic orientation and start point."""
+
+  def setUp(self):
+    image = np.full((40, 60, 3), 255, dtype=np.uint8)
+    image[10:30, 15:45] = 0
+    self.piece = JigsawPiece('square.png', image=image)
+
+  def test_segment(self):
+    """Segmented outlines are open, clockwise and start at the top left."""
+    self.piece.segment()
+    outline = self.piece.outline
+    self.assertFalse(np.array_equal(outline[0], outline[-1]))
+    self.assertTrue(util.signed_area(outline) < 0)
+    self.assertEqual(outline[0, 1], outline[:, 1].max())
+    self.assertEqual(
+      outline[0, 0], outline[outline[:, 1] == outline[0, 1], 0].min())
+
+  def test_deterministic(self):
+    """Outlines differing only in start and direction normalize the same."""
+    self.piece.segment(smoothing=1)
+    normalized = self.piece.outline
+    self.piece.outline = np.roll(normalized, 17, axis=0)[::-1]
+    self.piece.normalize_outline()
+    self.assertTrue(np.array_equal(normalized, self.piece.outline))
+
+
+class FindSidesTest(unittest.TestCase):
+  """Slicing sides out of the outline between corners."""
+
+  def setUp(self):
+    image = np.full((4, 4, 3), 255, dtype=np.uint8)
+    self.piece = JigsawPiece('square.png', image=image)
+    # A clockwise square with three points per side.
+    self.piece.outline = np.array([
+      [0, 0], [1, 0], [2, 0], [3, 0], [3, -1], [3, -2], [3, -3], [2, -3],
+      [1, -3], [0, -3], [0, -2], [0, -1]], dtype=float)
+
+  def test_wrapped_sides(self):
+    """Sides include both corners, even where they wrap around."""
+    self.piece.corner_indices = [9, 0, 3, 6]
+    self.piece.find_sides()
+    self.assertEqual(
+      [[0, -3], [0, -2], [0, -1], [0, 0]], self.piece.sides[0].tolist())
+    self.assertEqual(
+      [[0, 0], [1, 0], [2, 0], [3, 0]], self.piece.sides[1].tolist())
+    self.assertEqual(
+      [[3, -3], [2, -3], [1, -3], [0, -3]], self.piece.sides[3].tolist())
+    for side in self.piece.sides:
+      self.assertEqual(4, len(side))
+      self.assertFalse(side.flags.owndata)
+
+  def test_unordered_corners(self):
+    """Corners out of order along the outline are an error."""
+    self.piece.corner_indices = [0, 6, 3, 9]
+    self.assertRaises(ValueError, self.piece.find_sides)
+    self.piece.corner_indices = [0, 3, 3, 6]
+    self.assertRaises(ValueError, self.piece.find_sides)
+
+
+class EnhanceTest(unittest.TestCase):
+  """Enhancing in memory, rather than through an enhanced file."""
+
+  def test_same_as_enhanced_file(self):
+    """Both ways of enhancing give the same grey image."""
+    filepath = os.path.join(golden.SAMPLE_PIECES, '11.jpg')
+    handle, outpath = tempfile.mkstemp(suffix='.png')
+    os.close(handle)
+    try:
+      pipeline.enhance_file(filepath, outpath, cutoff=1)
+      from_file = JigsawPiece(outpath).grey_image
+    finally:
+      os.remove(outpath)
+    piece = JigsawPiece(filepath, image=pipeline.load_image(filepath))
+    piece.enhance(cutoff=1)
+    self.assertTrue(np.allclose(from_file, piece.grey_image))
+
+
+class LowMemoryTest(unittest.TestCase):
+  """Analyzing a piece while keeping as little in memory as possible."""
+
+  def setUp(self):
+    self.filepath = os.path.join(golden.SAMPLE_PIECES, '8.jpg')
+    self.piece = JigsawPiece(self.filepath, low_memory=True)
+
+  def test_analyze(self):
+    """Images are compact or reopened, and intermediates are packed."""
+    piece_data = pipeline.analyze_piece(self.piece)
+    self.assertEqual(np.uint8, self.piece.grey_image.dtype)
+    self.assertEqual(None, self.piece._raw_image)
+    self.assertEqual(
+      JigsawPiece(self.filepath).raw_image.shape, self.piece.raw_image.shape)
+    self.assertEqual([], self.piece.segmentation)
+    self.assertEqual(
+      records.HAUSDORFF_SCORE_DTYPE, self.piece.hausdorff_scores.dtype)
+    self.assertEqual(len(self.piece.outline), len(self.piece.hausdorff_scores))
+    self.assertEqual(records.RECT_CANDIDATE_DTYPE, self.piece.areas.dtype)
+    expected = golden.load()['pieces']['8.jpg']
+    self.assertEqual(expected['side_types'], piece_data['side_types'])
+
+  def test_release_images(self):
+    """Released raw images are reopened when they're needed."""
+    piece = JigsawPiece(self.filepath)
+    raw_image = piece.raw_image
+    piece.segment()
+    piece.release_images()
+    self.assertEqual(None, piece._raw_image)
+    self.assertEqual(None, piece.grey_image)
+    self.assertEqual([], piece.segmentation)
+    self.assertTrue(np.array_equal(raw_image, piece.raw_image))
@@ -0,0 +1,66 @@
+"""Tests for quandry.records."""
+
+import os
+import unittest
+
+import numpy as np
+
+from quandry import golden
+from quandry import pipeline
+from quandry import records
+from quandry.piece import JigsawPiece
+from quandry.tests.matcher_tests import make_piece
+
+
+class StructuredArrayTest(unittest.TestCase):
+  """Packing per-point and per-rectangle lists."""
+
+  def test_hausdorff_scores(self):
+    scores = records.hausdorff_score_array(
+      [[0, np.array([1., -2.]), 3.], [1, np.array([2., -2.]), 1.5]])
+    self.assertEqual([0, 1], scores['index'].tolist())
+    self.assertEqual([[1, -2], [2, -2]], scores['point'].tolist())
+    self.assertEqual(1, np.argmin(scores['score']))
+
+  def test_rect_candidates(self):
+    rects = records.rect_candidate_array([[[4, 9, 2, 7], 400.]])
+    self.assertEqual([[4, 9, 2, 7]], rects['corners'].tolist())
+    self.assertEqual([400.], rects['area'].tolist())
+
+
+class PieceSummaryTest(unittest.TestCase):
+  """Summarizing piece data."""
+
+  def test_from_data(self):
+    summary = records.PieceSummary.from_data('a', make_piece(
+      ['in', 'out', 'flat', 'flat'], [30, 31, 32, 33]))
+    self.assertEqual(
+      ['a+0', 'a+1', 'a+2', 'a+3'], [side.name for side in summary.sides])
+    self.assertEqual(31, summary.sides[1].length)
+    self.assertEqual(np.float32, summary.sides[1].outline.dtype)
+
+  def test_from_piece(self):
+    """Summarizing an analyzed piece matches summarizing its piece data."""
+    piece = JigsawPiece(os.path.join(golden.SAMPLE_PIECES, '8.jpg'))
+    piece_data = pipeline.analyze_piece(piece)
+    summary = records.PieceSummary.from_piece('8.jpg', piece)
+    expected = records.PieceSummary.from_data('8.jpg', piece_data)
+    self.assertEqual(expected.corners.tolist(), summary.corners.tolist())
+    for side, expected_side in zip(summary.sides, expected.sides):
+      self.assertEqual(expected_side.name, side.name)
+      self.assertEqual(expected_side.type, side.type)
+      self.assertEqual(expected_side.length, side.length)
+      self.assertEqual(np.float32, side.outline.dtype)
+      self.assertEqual(
+        expected_side.outline.tolist(), side.outline.tolist())
+      self.assertTrue(np.allclose(expected_side.signature, side.signature))
+
+  def test_sides_are_slotted(self):
+    side = records.Side('a', 0, 'in', 30., [[0, 0], [30, 0]])
+    self.assertRaises(AttributeError, setattr, side, 'raw_image', None)
+
+  def test_side_round_trip(self):
+    side = records.Side('a', 2, 'out', 30., [[0, 0], [15, 5], [30, 0]])
+    restored = records.Side.from_dict(side.to_dict())
+    self.assertEqual(side.name, restored.name)
+    self.assertEqual(side.outline.tolist(), restored.outline.tolist())
@@ -0,0 +1,108 @@
+"""Tests for quandry.server.AnalysisQueue."""
+
+import multiprocessing
+import threading
+import time
+import unittest
+
+from quandry import server
+
+
+def slow_double(value, delay):
+  """Stand in for piece analysis in the worker processes."""
+  time.sleep(delay)
+  return 2 * value
+
+
+def wait_double(value, event):
+  """Stand in for piece analysis that finishes once the event is set."""
+  event.wait()
+  return 2 * value
+
+
+def fail(value):
+  """Stand in for an analysis that fails."""
+  raise ValueError('bad image %s' % value)
+
+
+class AnalysisQueueTest(unittest.TestCase):
+  """Running jobs on a bounded pool."""
+
+  def setUp(self):
+    self.manager = multiprocessing.Manager()
+    self.event = self.manager.Event()
+    self.queue = server.AnalysisQueue(
+      processes=1, max_pending=2, function=wait_double)
+
+  def tearDown(self):
+    self.queue.close()
+    self.manager.shutdown()
+
+  def test_results(self):
+    self.event.set()
+    self.assertEqual(6, self.queue.submit(3, self.event))
+    metrics = self.queue.metrics()
+    self.assertEqual(1, metrics['completed'])
+    self.assertEqual(0, metrics['queue_depth'])
+    self.assertTrue(metrics['latency']['max'] >= 0)
+
+  def test_full_queue_rejects_jobs(self):
+    """Jobs beyond max_pending are turned away rather than queued."""
+    threads = [
+      threading.Thread(target=self.queue.submit, args=(1, self.event))
+      for _ in range(2)]
+    for thread in threads:
+      thread.start()
+    # Jobs can't finish until the event is set, so wait for both to be
+    # admitted.
+    deadline = time.time() + 10
+    while self.queue.metrics()['queue_depth'] < 1 and time.time() < deadline:
+      time.sleep(0.01)
+    metrics = self.queue.metrics()
+    self.assertEqual(1, metrics['running'])
+    self.assertEqual(1, metrics['queue_depth'])
+    self.assertRaises(server.QueueFull, self.queue.submit, 1, self.event)
+    self.event.set()
+    for thread in threads:
+      thread.join()
+    metrics = self.queue.metrics()
+    self.assertEqual(2, metrics['completed'])
+    self.assertEqual(1, metrics['rejected'])
+    self.assertEqual(0, metrics['running'])
+
+  def test_failures_are_counted(self):
+    queue = server.AnalysisQueue(processes=1, function=fail)
+    try:
+      self.assertRaises(ValueError, queue.submit, 1)
+      self.assertEqual(1, queue.metrics()['failed'])
+    finally:
+      queue.close()
+
+  def test_timeouts_are_failures(self):
+    """Jobs that take too long are given up on and counted as failed."""
+    queue = server.AnalysisQueue(
+      processes=1, function=slow_double, timeout=0.05)
+    try:
+      self.assertRaises(server.JobTimeout, queue.submit, 1, 1)
+      metrics = queue.metrics()
+      self.assertEqual(1, metrics['failed'])
+      self.assertEqual(1, metrics['timed_out'])
+    finally:
+      queue.close()
+
+  def test_timed_out_jobs_keep_their_place(self):
+    """A timed out job still counts against max_pending until it ends."""
+    queue = server.AnalysisQueue(
+      processes=1, max_pending=1, function=wait_double, timeout=0.05)
+    try:
+      self.assertRaises(server.JobTimeout, queue.submit, 1, self.event)
+      self.assertEqual(1, queue.metrics()['running'])
+      self.assertRaises(server.QueueFull, queue.submit, 1, self.event)
+      self.event.set()
+      deadline = time.time() + 10
+      while queue.metrics()['running'] and time.time() < deadline:
+        time.sleep(0.01)
+      self.assertEqual(0, queue.metrics()['running'])
+      self.assertEqual(2, queue.submit(1, self.event))
+    finally:
+      queue.close()
@@ -0,0 +1,48 @@
+"""Tests for quandry.sweep."""
+
+import os
+import unittest
+
+from quandry import golden
+from quandry import sweep
+
+
+class ExpandGridTest(unittest.TestCase):
+  """Turning parameter grids into variants."""
+
+  def test_defaults(self):
+    """Every combination is made, with defaults for missing parameters."""
+    variants = sweep.expand_grid(
+      {'low_threshold': [40, 50], 'angle_threshold': [0.3, 0.4, 0.5]})
+    self.assertEqual(6, len(variants))
+    self.assertEqual(set([40, 50]), set(v['low_threshold'] for v in variants))
+    self.assertTrue(all(v['segment_size'] == 30 for v in variants))
+
+  def test_unknown_parameter(self):
+    """Parameters that no stage uses are an error."""
+    self.assertRaises(ValueError, sweep.expand_grid, {'threshold': [1]})
+
+
+class SweepPieceTest(unittest.TestCase):
+  """Sweeping one piece with shared stage results."""
+
+  def test_shared_stages(self):
+    """Stages run once per distinct set of upstream parameters."""
+    filepath = os.path.join(golden.SAMPLE_PIECES, '8.jpg')
+    variants = sweep.expand_grid({
+      'number_of_candidate_corners': [70, 80],
+      'percent_diff_threshold': [0.01, 0.08, 0.5]})
+    rows, stage_runs = sweep.sweep_piece(filepath, variants)
+    self.assertEqual(6, len(rows))
+    self.assertEqual(1, stage_runs['outline'])
+    self.assertEqual(1, stage_runs['corner_scores'])
+    self.assertEqual(2, stage_runs['corners'])
+    self.assertEqual(6, stage_runs['side_types'])
+    expected = golden.load()['pieces']['8.jpg']
+    for row in rows:
+      self.assertEqual(None, row['error'])
+      if (row['number_of_candidate_corners'] == 80 and
+          row['percent_diff_threshold'] == 0.08):
+        self.assertEqual(expected['side_types'], row['side_types'])
+      if row['percent_diff_threshold'] == 0.5:
+        self.assertEqual(['flat'] * 4, row['side_types'])
@@ -0,0 +1,98 @@
+"""Tests for quandry.util."""
+
+import unittest
+
+import numpy as np
+
+from quandry import util
+
+
+class AutocontrastTest(unittest.TestCase):
+  """Stretching image intensities."""
+
+  def test_uint8_channels_are_stretched_separately(self):
+    image = np.zeros((2, 2, 3), dtype=np.uint8)
+    image[:, :, 0] = [[10, 20], [30, 40]]
+    image[:, :, 1] = [[100, 100], [150, 200]]
+    image[:, :, 2] = 7
+    stretched = util.autocontrast(image)
+    self.assertEqual(np.uint8, stretched.dtype)
+    self.assertEqual([[0, 85], [170, 255]], stretched[:, :, 0].tolist())
+    self.assertEqual([[0, 0], [128, 255]], stretched[:, :, 1].tolist())
+    # Flat channels are left alone rather than divided by zero.
+    self.assertEqual(0, stretched[:, :, 2].max())
+
+  def test_float_grey_image(self):
+    image = np.array([[0.2, 0.3], [0.4, 0.6]])
+    stretched = util.autocontrast(image)
+    self.assertAlmostEqual(0, stretched.min())
+    self.assertAlmostEqual(1, stretched.max())
+    self.assertAlmostEqual(0.25, stretched[0, 1], places=5)
+
+  def test_cutoff_clips_outliers(self):
+    image = np.arange(101, dtype=np.uint8).reshape(1, 101)
+    stretched = util.autocontrast(image, cutoff=10)
+    self.assertEqual(0, stretched[0, 10])
+    self.assertEqual(255, stretched[0, 90])
+    self.assertEqual(0, stretched[0, 0])
+
+
+class SideSignatureTest(unittest.TestCase):
+  """Describing side shapes."""
+
+  def setUp(self):
+    xs = np.linspace(0, 30, 61)
+    self.side = np.column_stack((xs, 6 * np.exp(-(xs - 15)**2 / 20.)))
+
+  def test_invariance(self):
+    """Moving, turning, scaling, flipping or reversing a side is ignored."""
+    signature = util.side_signature(self.side)
+    rotation_matrix = np.array([[0.6, -0.8], [0.8, 0.6]])
+    moved = 2.5 * np.dot(self.side, rotation_matrix.T) + [40, -7]
+    flipped = self.side[::-1] * [1, -1]
+    for other in (moved, flipped):
+      self.assertTrue(np.allclose(signature, util.side_signature(other)))
+
+  def test_different_shapes(self):
+    """Flat and bumpy sides have different signatures."""
+    flat = np.column_stack((np.linspace(0, 30, 61), np.zeros(61)))
+    difference = util.side_signature(self.side) - util.side_signature(flat)
+    self.assertTrue(np.sqrt(np.sum(difference**2)) > 0.1)
+
+
+class SignedAreaTest(unittest.TestCase):
+  """Measuring the area and orientation of outlines."""
+
+  def test_orientation(self):
+    """Counter-clockwise outlines have positive area, clockwise negative."""
+    square = np.array([[0, 0], [2, 0], [2, 2], [0, 2]], dtype=float)
+    self.assertEqual(4, util.signed_area(square))
+    self.assertEqual(-4, util.signed_area(square[::-1]))
+
+
+class AlignSideTest(unittest.TestCase):
+  """Putting sides into their canonical forms for comparison."""
+
+  def setUp(self):
+    x = np.linspace(0, 30, 61)
+    self.side = np.column_stack((x, 5 * np.sin(x * np.pi / 30)))
+
+  def test_forms(self):
+    """Aligned sides end on the x-axis, translated ones start at 0."""
+    rotation_matrix = np.array([[0.6, -0.8], [0.8, 0.6]])
+    moved = np.dot(self.side, rotation_matrix.T) + [40, -7]
+    aligned, translated = util.align_side(moved)
+    self.assertTrue(np.allclose(self.side, aligned))
+    self.assertTrue(np.allclose(moved - moved[0], translated))
+
+  def test_hausdorff(self):
+    """Sides are aligned at their first points, and compared mirrored too."""
+    other = self.side[::2] * [1, -1.5] + [3, 2]
+    score = util.hausdorff(self.side, other)
+    self.assertTrue(score > 0)
+    moved_side = self.side + [40, -7]
+    moved_other = other - [8, 1]
+    self.assertAlmostEqual(score, util.hausdorff(moved_side, moved_other))
+    self.assertAlmostEqual(
+      score, util.bounded_hausdorff(moved_side, moved_other))
+    self.assertAlmostEqual(0, util.hausdorff(self.side, self.side * [1, -1]))
@@ -2,7 +2,6 @@
 
 import math
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 
@@ -42,36 +41,134 @@ def distance_to_line(line_endpoints, c):
   return result[0]
 
 
+def signed_area(outline):
+  """Find the signed area of a closed outline with the shoelace formula.
+
+  The area is positive for counter-clockwise outlines and negative for
+  clockwise ones.
+  """
+  x, y = outline[:, 0], outline[:, 1]
+  return 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+
+
 def percent_diff(a, b):
   """Get the percent difference between two values."""
   return 100. * abs(a - b) / a
 
 
-def translate_line(line, p):
-  """Translate a line such that the first point lies at point p.
+def autocontrast(image, cutoff=0):
+  """Stretch an image's intensities to fill the whole range.
+
+  Like PIL's ImageOps.autocontrast, each channel is stretched separately and
+  the darkest and lightest cutoff percent of pixels are clipped.  uint8 images
+  stay uint8, anything else is treated as floats from 0 to 1.
+  """
+  image = np.asarray(image)
+  channels = image.shape[-1] if image.ndim == 3 else 1
+  pixels = image.reshape(-1, channels)
+  low, high = np.percentile(pixels, (cutoff, 100 - cutoff), axis=0)
+  span = np.where(high > low, high - low, 1)
+  if image.ndim == 2:
+    low, span = low[0], span[0]
+  stretched = np.clip((image.astype(np.float32) - low) / span, 0, 1)
+  if image.dtype == np.uint8:
+    return np.round(stretched * 255).astype(np.uint8)
+  return stretched
+
+
+def resample_line(line, count):
+  """Resample a line at count points evenly spaced along its length."""
+  line = np.asarray(line, dtype=float)
+  segment_lengths = np.sqrt(np.sum(np.diff(line, axis=0)**2, axis=1))
+  path_positions = np.concatenate(([0], np.cumsum(segment_lengths)))
+  samples = np.linspace(0, path_positions[-1], count)
+  return np.column_stack((
+    np.interp(samples, path_positions, line[:, 0]),
+    np.interp(samples, path_positions, line[:, 1])))
+
+
+def side_signature(side, points=64, bins=8, descriptors=8):
+  """Compute a compact signature that describes a side's shape.
+
+  The signature is invariant to translation, rotation and scale, and also to
+  reflection and to the direction the side is traced in, so an in side and
+  the out side that fits it have similar signatures.  It's made of:
+
+    - a histogram of the absolute turning angle between successive segments
+      of the side, resampled at evenly spaced points
+    - Fourier descriptor magnitudes, combining each positive and negative
+      frequency and normalized by their total
+    - the aspect ratio (height / width) of the side's bounding box, measured
+      with the line between the side's endpoints as the x-axis
 
-  The line should be a list of (x, y) pairs.
+  Returns a 1D array of bins + descriptors + 1 values.
   """
-  xs, ys = zip(*line)
-  translated_x = [x - p[0] for x in xs]
-  translated_y = [y - p[1] for y in ys]
-  return zip(*[translated_x, translated_y])
-
-
-def reflect_point(p, line):
-  """Reflect a point, p, over a line defined by two endpoints."""
-  # Create a vector that runs through the origin.
-  l1, l2 = line
-  v = np.array((float(l2[0] - l1[0]), l2[1] - l1[1]))
-  # Translate the to-be-reflected point as well, then do some vector math..
-  #print p, l1
-  p = np.array(p) - np.array(l1)
-  k = np.dot(p, v) / np.dot(v, v) * v
-  # Translate everything back.
-  return 2 * k - p + np.array(l1)
-
-
-def hausdorff(a, b):
+  line = resample_line(side, points)
+  # Turning angle histogram.
+  deltas = np.diff(line, axis=0)
+  tangents = np.arctan2(deltas[:, 1], deltas[:, 0])
+  turns = np.abs((np.diff(tangents) + np.pi) % (2 * np.pi) - np.pi)
+  histogram, _ = np.histogram(
+    np.minimum(turns, np.pi / 4 - 1e-9), bins=bins, range=(0, np.pi / 4))
+  histogram = histogram / float(len(turns))
+  # Fourier descriptors.
+  coefficients = np.abs(np.fft.fft(line[:, 0] + 1j * line[:, 1]))
+  magnitudes = np.array([
+    coefficients[k] + coefficients[-k] for k in range(1, descriptors + 1)])
+  magnitudes = magnitudes / max(np.sum(magnitudes), 1e-9)
+  # Aspect ratio along the endpoint chord.
+  theta = angle(line[0], line[-1])
+  rotation_matrix = np.array([
+    [math.cos(-theta), -math.sin(-theta)],
+    [math.sin(-theta), math.cos(-theta)]])
+  aligned = np.dot(line - line[0], rotation_matrix.T)
+  extent = aligned.max(axis=0) - aligned.min(axis=0)
+  aspect_ratio = extent[1] / max(extent[0], 1e-9)
+  return np.concatenate((histogram, magnitudes, [aspect_ratio]))
+
+
+def align_side(line):
+  """Put a line into the canonical forms used for Hausdorff comparisons.
+
+  hausdorff translates line a to the origin, translates line b the same way,
+  rotates b through the angle theta to a's endpoint and reflects it over a's
+  endpoint vector.  Rotating everything back through -theta doesn't change
+  any distances, and leaves each line's transform depending on that line
+  alone: a is translated and rotated so that its endpoint lies on the x-axis,
+  while b is only translated, and its reflection is just a flip over the
+  x-axis.  So each side's form can be computed once, with one matrix
+  multiply, and reused for every comparison.  The flip is left to the
+  distance routines, which negate b's y coordinates as they go.
+
+  Returns the aligned line, for use as line a, and the translated line, for
+  use as line b, as (N, 2) float arrays.
+  """
+  translated = np.asarray(line, dtype=float)
+  translated = translated - translated[0]
+  theta = math.atan2(translated[-1][1], translated[-1][0])
+  cosine, sine = math.cos(theta), math.sin(theta)
+  # Points are rows, so this rotates each one through -theta.
+  aligned = np.dot(translated, np.array([[cosine, -sine], [sine, cosine]]))
+  return aligned, translated
+
+
+def squared_distances(a, b, flip=False):
+  """Squared distances between each point in a and each point in b.
+
+  If flip is set, b is flipped over the x-axis first, without copying it.
+  """
+  combine_y = np.add if flip else np.subtract
+  dx = a[:, np.newaxis, 0] - b[np.newaxis, :, 0]
+  dy = combine_y(a[:, np.newaxis, 1], b[np.newaxis, :, 1])
+  return dx**2 + dy**2
+
+
+def mean_min_distance(a, b, flip=False):
+  """Mean distance from each point in a to its nearest point in b."""
+  return np.mean(np.sqrt(np.min(squared_distances(a, b, flip), axis=1)))
+
+
+def hausdorff(a, b, plot_path=None):
   """Compute Hausdorff distance between two lines.
 
   Each line, a and b, should be lists of (x, y) points.  The first line will
@@ -85,41 +182,107 @@ def hausdorff(a, b):
   over V.
 
   Finally we'll apply the Hausdorff routine to the reflected and non-reflected
-  forms of b and return the minimum score between the two.
+  forms of b and return the minimum score between the two.  This is all done
+  on the lines' canonical forms -- see align_side.
+
+  If plot_path is given, the aligned lines are plotted and saved there.
   """
-  translated_a = translate_line(a, a[0])
-  theta = angle(translated_a[0], translated_a[-1])
-  v = [translated_a[0], translated_a[-1]]
-  translated_b = translate_line(b, b[0])
-  # The rotation method has some weird return values at the moment..
-  rotated_b = []
-  for point in translated_b:
-    rotated_point = rotate(point, theta)
-    rotated_b.append([rotated_point[0][0], rotated_point[1][0]])
-  reflected_b = [reflect_point(p, v) for p in rotated_b]
-  # Run the Hausdorff routine between (translated_a, rotated_b) and
-  # (translated_a, reflected_b).
-  results = []
-  for b_line in (reflected_b, rotated_b):
-    min_distances = []
-    for point in translated_a:
-      distances = [distance(point, b) for b in b_line]
-      min_distances.append(min(distances))
-    results.append(np.mean(min_distances))
-
-  # let's plot some stuff..
+  aligned_a = align_side(a)[0]
+  translated_b = align_side(b)[1]
+  if plot_path:
+    plot_lines((aligned_a, translated_b, translated_b * [1, -1]), plot_path)
+  return aligned_hausdorff(aligned_a, translated_b)
+
+
+def aligned_hausdorff(aligned_a, translated_b):
+  """Compute the Hausdorff score between lines already put through align_side.
+
+  Arguments:
+    aligned_a: line a's aligned form
+    translated_b: line b's translated form
+  """
+  return min(mean_min_distance(aligned_a, translated_b, flip)
+             for flip in (True, False))
+
+
+def plot_lines(lines, filepath):
+  """Plot lines of (x, y) points and save the figure."""
+  # pyplot is slow to import, so only load it when we actually plot.
+  import matplotlib.pyplot as plt
   ax = plt.subplot('111')
-  x = [p[0] for p in translated_a]
-  y = [p[1] for p in translated_a]
-  ax.plot(x, y)
-  x = [p[0] for p in reflected_b]
-  y = [p[1] for p in reflected_b]
-  ax.plot(x, y)
-  x = [p[0] for p in rotated_b]
-  y = [p[1] for p in rotated_b]
-  ax.plot(x, y)
+  for line in lines:
+    x = [p[0] for p in line]
+    y = [p[1] for p in line]
+    ax.plot(x, y)
   ax.set_aspect('equal')
   figure = plt.gcf()
-  figure.savefig('/tmp/hout.png', dpi=200)
+  figure.savefig(filepath, dpi=200)
+
+
+def bounded_mean_min_distance(a, b, threshold, coarse_step=8, flip=False):
+  """Mean distance from each point in a to its nearest point in b, if small.
+
+  This is the inner Hausdorff routine, but it gives up as soon as a lower
+  bound on the result exceeds the threshold.  The bound starts as the mean
+  distance from a's points to b's bounding box, which can never be more than
+  the true distance.  Exact distances then replace the box distances for a
+  coarse subsample of a (every coarse_step-th point), followed by the
+  subsamples that fill in the gaps, so the bound tightens quickly.
+
+  Arguments:
+    a, b: (N, 2) and (M, 2) arrays of points
+    threshold: the largest score we still care about
+    flip: whether to flip b over the x-axis first
+
+  Returns the mean distance, or None if it would exceed the threshold.
+  """
+  limit = threshold * len(a)
+  b_min, b_max = b.min(axis=0), b.max(axis=0)
+  if flip:
+    b_min, b_max = (np.array([b_min[0], -b_max[1]]),
+                    np.array([b_max[0], -b_min[1]]))
+  box_gaps = np.maximum(np.maximum(b_min - a, a - b_max), 0)
+  box_distances = np.sqrt(np.sum(box_gaps**2, axis=1))
+  bound = np.sum(box_distances)
+  if bound > limit:
+    return None
+  for offset in range(coarse_step):
+    points = a[offset::coarse_step]
+    if not len(points):
+      continue
+    min_distances = np.sqrt(
+      np.min(squared_distances(points, b, flip), axis=1))
+    bound += (np.sum(min_distances) -
+              np.sum(box_distances[offset::coarse_step]))
+    if bound > limit:
+      return None
+  return bound / len(a)
+
+
+def bounded_hausdorff(a, b, threshold=float('inf'), coarse_step=8):
+  """Compute the Hausdorff score between two lines, unless it's too large.
+
+  Lines are aligned just as in hausdorff, and the score is the same, but
+  comparisons are abandoned early once they provably can't beat the
+  threshold.  This is useful for top-k queries where most candidates are
+  much worse than the current best.
+
+  Returns the score, or None if it exceeds the threshold.
+  """
+  return bounded_aligned_hausdorff(
+    align_side(a)[0], align_side(b)[1], threshold, coarse_step)
+
 
-  return min(results)
+def bounded_aligned_hausdorff(aligned_a, translated_b,
+                              threshold=float('inf'), coarse_step=8):
+  """bounded_hausdorff, for lines already put through align_side."""
+  best = None
+  # Flipped forms usually fit better, so trying them first tightens the
+  # threshold sooner.
+  for flip in (True, False):
+    score = bounded_mean_min_distance(
+      aligned_a, translated_b, threshold, coarse_step, flip)
+    if score is not None and score <= threshold:
+      # The other form of b now only matters if it beats this one.
+      best, threshold = score, score
+  return best
@@ -0,0 +1,70 @@
+"""Sweeping analysis parameters over puzzle piece images.
+
+The grid is a json file mapping parameter names to lists of values, like
+{"low_threshold": [40, 50], "percent_diff_threshold": [0.06, 0.08, 0.1]}.
+Every combination is tried on every piece, with parameters missing from the
+grid left at their defaults.  Parameters are:
+
+  low_threshold, high_threshold, smoothing  (segmentation)
+  segment_size, number_of_candidate_corners  (template corners)
+  center_dist_threshold, angle_threshold  (true corners)
+  percent_diff_threshold  (side types)
+
+Results are written as csv, one row per piece and combination.
+
+Usage:
+  sweep.py <grid-filepath> [<filepath>...] [--out=<csv>] [--processes=<n>]
+
+Arguments:
+  <grid-filepath>  path to the parameter grid json
+  <filepath>  path to an image file (the sample pieces if unset)
+
+Options:
+  --out=<csv>  where to save the results (printed if unset)
+  --processes=<n>  how many processes to use (defaults to one per cpu)
+"""
+
+import csv
+import json
+import sys
+
+from docopt import docopt
+
+from quandry import golden
+from quandry import sweep
+
+
+COLUMNS = ('piece',) + sweep.PARAMETERS + (
+  'side_types', 'side_lengths', 'corners', 'error')
+
+
+def format_value(value):
+  """Flatten lists so they fit in a csv cell."""
+  if isinstance(value, list):
+    return ' '.join(format_value(v) for v in value)
+  if isinstance(value, float):
+    return '%0.4g' % value
+  return '' if value is None else str(value)
+
+
+if __name__ == '__main__':
+  args = docopt(__doc__)
+  with open(args['<grid-filepath>']) as grid_file:
+    grid = json.loads(grid_file.read())
+  filepaths = args['<filepath>'] or golden.sample_filepaths()
+  processes = int(args['--processes']) if args['--processes'] else None
+  table, stage_runs = sweep.sweep(filepaths, grid, processes)
+
+  out_file = open(args['--out'], 'wb') if args['--out'] else sys.stdout
+  writer = csv.writer(out_file)
+  writer.writerow(COLUMNS)
+  for row in table:
+    writer.writerow([format_value(row.get(column)) for column in COLUMNS])
+  if args['--out']:
+    out_file.close()
+
+  # Show how much work was shared between variants.
+  variants = len(table) / max(len(filepaths), 1)
+  print >> sys.stderr, '%s variants of %s pieces' % (variants, len(filepaths))
+  for stage, _, _ in sweep.STAGES:
+    print >> sys.stderr, '%20s  ran %4s times' % (stage, stage_runs[stage])